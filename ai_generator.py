@@ -2,11 +2,15 @@ import os
 import json
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from dotenv import load_dotenv
 
 import re
+import time
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
 
 load_dotenv()
 
@@ -18,6 +22,210 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Translation is split into chunks of about this many input tokens. Indic scripts need
+# several times more output tokens than the English input, so chunks stay well below the limit.
+TRANSLATION_CHUNK_TOKENS = 2000
+TRANSLATION_WORKERS = 4
+TRANSLATION_RETRIES = 2
+
+def _repair_json(bad_json_str):
+    """Attempts to fix common LLM JSON errors, including truncation and unclosed quotes."""
+    fixed = bad_json_str.strip()
+    
+    # 1. Surgical Backslash Protection
+    # Only double backslashes that are NOT followed by characters that should be escaped in JSON (", \, /, b, f, n, r, t, u)
+    # This prevents breaking \" (escaped quote) while fixing \frac (missing backslash for JSON)
+    
+    def bslash_rep(m):
+        bs = m.group(1)
+        char = m.group(2)
+        # If it's already a valid JSON escape sequence, leave it
+        if char in '"\\/bfnrtu':
+            return bs + char
+        # Otherwise, it might be a LaTeX command like \frac -> needs to be \\frac for JSON
+        return bs + bs + char
+
+    fixed = re.sub(r'(\\+)(.)', bslash_rep, fixed)
+
+    # 2. Handle unclosed quotes (aware of escaped quotes)
+    quote_count = len(re.findall(r'(?<!\\)"', fixed))
+    if quote_count % 2 != 0:
+        fixed += '"'
+
+    # 3. Handle truncation: Close objects and, when repairing a list, the list itself.
+    # A single object (as salvaged by _scan_json_objects) gets no ']', which would make it invalid
+    if not fixed.endswith(']'):
+        opens = fixed.count('{')
+        closes = fixed.count('}')
+        if opens > closes:
+            fixed += '}' * (opens - closes)
+        if fixed.startswith('[') and not fixed.endswith(']'):
+            fixed += ']'
+    
+    return fixed
+
+def _extract_json(content):
+    """Extracts JSON block from response, handling markdown code blocks."""
+    # Try finding JSON in markdown blocks first
+    md_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
+    if md_match:
+        return md_match.group(1)
+    
+    # Fallback: Greedy from first [ to last ]
+    start = content.find('[')
+    end = content.rfind(']')
+    if start != -1 and end != -1:
+        return content[start:end+1]
+    
+    return content
+
+def _scan_json_objects(json_str):
+    """Recovers every balanced { ... } block that parses, skipping the broken ones."""
+    # We use a balanced brace approach since LaTeX uses braces too
+    valid_qs = []
+    current_pos = 0
+    while True:
+        s_idx = json_str.find('{', current_pos)
+        if s_idx == -1: break
+        
+        # Find matching closure
+        brace_lvl = 0
+        e_idx = -1
+        for i in range(s_idx, len(json_str)):
+            if json_str[i] == '{': brace_lvl += 1
+            elif json_str[i] == '}': 
+                brace_lvl -= 1
+                if brace_lvl == 0:
+                    e_idx = i
+                    break
+        
+        if e_idx != -1:
+            obj_str = json_str[s_idx:e_idx+1]
+            try:
+                # Still need to repair the small block
+                rep_obj = _repair_json(obj_str)
+                valid_qs.append(json.loads(rep_obj))
+            except: pass
+            current_pos = e_idx + 1
+        else:
+            break
+    return valid_qs
+
+def _is_too_similar(q_text, gathered_questions):
+    """Simple keyword overlap check to prevent same-topic questions."""
+    if not gathered_questions: return False
+    words_new = set(re.findall(r'\w+', q_text.lower()))
+    if len(words_new) < 5: return False # Skip for very short ones
+    
+    for gq in gathered_questions:
+        words_old = set(re.findall(r'\w+', gq['question_text'].lower()))
+        overlap = len(words_new.intersection(words_old)) / max(len(words_new), 1)
+        if overlap > 0.45: # 45% overlap is usually the same sub-topic or formula
+            return True
+    return False
+
+class GeneratedQuestion(BaseModel):
+    """Schema every generated question must pass before it can reach an exam."""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, coerce_numbers_to_str=True)
+
+    question_text: str = Field(min_length=10)
+    option_a: str = Field(min_length=1)
+    option_b: str = Field(min_length=1)
+    option_c: str = Field(min_length=1)
+    option_d: str = Field(min_length=1)
+    correct_option: str
+    explanation: Optional[str] = None
+    appeared_in: Optional[str] = None
+
+    @field_validator("correct_option", mode="before")
+    @classmethod
+    def _option_letter(cls, value):
+        # Accept "b", "B)", "(B)", "B.", "Option B" as well as a bare "B", but not option text such as "A bird"
+        match = re.match(r'^\(?(?:option\s*)?([A-D])(?:\s*$|[).])', str(value).strip(), re.IGNORECASE)
+        return match.group(1).upper() if match else value
+
+    @field_validator("explanation", mode="before")
+    @classmethod
+    def _explanation_text(cls, value):
+        # Some models return the explanation steps as a list
+        if isinstance(value, list):
+            return "\n".join(str(step) for step in value)
+        return value
+
+    @model_validator(mode="after")
+    def _check_options(self):
+        options = [self.option_a, self.option_b, self.option_c, self.option_d]
+        if self.correct_option not in ("A", "B", "C", "D"):
+            # Some models answer with the option text instead of its letter
+            matches = [key for key, text in zip("ABCD", options) if text.casefold() == self.correct_option.casefold()]
+            if len(matches) != 1:
+                raise ValueError("correct_option must be A, B, C or D")
+            self.correct_option = matches[0]
+        if len({text.casefold() for text in options}) < 4:
+            raise ValueError("options must be distinct")
+        return self
+
+def _validate_questions(items):
+    """Validates parsed objects one by one. Returns (valid question dicts, Counter of rejection reasons)."""
+    valid, rejected = [], Counter()
+    for item in items:
+        if not isinstance(item, dict):
+            rejected["not an object"] += 1
+            continue
+        try:
+            valid.append(GeneratedQuestion.model_validate(item).model_dump(exclude_none=True))
+        except ValidationError as e:
+            error = e.errors()[0]
+            rejected[f"{'.'.join(str(part) for part in error['loc']) or 'question'}: {error['msg']}"] += 1
+    return valid, rejected
+
+def _parse_json_list(content):
+    """Parses an LLM response into a list, repairing or salvaging objects when needed. Returns None on failure."""
+    json_str = _extract_json(content)
+    for parse in (json.loads, lambda js: json.loads(_repair_json(js))):
+        try:
+            parsed = parse(json_str)
+            return parsed if isinstance(parsed, list) else [parsed]
+        except (json.JSONDecodeError, ValueError):
+            continue
+    return _scan_json_objects(json_str) or None
+
+def _estimate_tokens(text):
+    # ~4 characters per token for English/LaTeX prompts; good enough for sizing chunks
+    return len(text) // 4 + 1
+
+def _chunk_questions(questions, max_tokens):
+    """Packs questions, in order, into chunks whose JSON stays under `max_tokens` (one oversized question gets its own chunk)."""
+    chunks, current, size = [], [], 0
+    for q in questions:
+        tokens = _estimate_tokens(json.dumps(q, ensure_ascii=False))
+        if current and size + tokens > max_tokens:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(q)
+        size += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _validate_translation(source, translated):
+    """Checks a translated chunk against its source. Returns the cleaned list, or None if it is unusable."""
+    if not isinstance(translated, list) or len(translated) != len(source):
+        return None
+    result = []
+    for src, tr in zip(source, translated):
+        if not isinstance(tr, dict) or tr.get('id', src['id']) != src['id']:
+            return None
+        if str(tr.get('correct_option', '')).strip().upper() != src.get('correct_option'):
+            return None
+        if any(not isinstance(tr.get(key), str) or not tr[key].strip() for key in ['question_text', 'option_a', 'option_b', 'option_c', 'option_d'] if src.get(key)):
+            return None
+        # Fields the model dropped fall back to the source; id and answer key always come from it
+        merged = dict(src, **{k: v for k, v in tr.items() if k in src and v})
+        merged.update(id=src['id'], correct_option=src['correct_option'])
+        result.append(merged)
+    return result
+
 class QuestionGenerator:
     def __init__(self):
         api_key = os.getenv("GROQ_API_KEY")
@@ -29,7 +237,8 @@ class QuestionGenerator:
             model_name="llama-3.3-70b-versatile",
             groq_api_key=api_key
         )
-        self.parser = JsonOutputParser()
+        # Per-model counts of what came back and why objects were rejected
+        self.stats = {}
 
     def _clean_latex(self, text):
         """Standardizes LaTeX escaping and ensures it is wrapped in $ if not already."""
@@ -167,6 +376,12 @@ class QuestionGenerator:
                 
         return '\n'.join(final_lines)
 
+    def _rejection_rate(self, model):
+        stats = self.stats.get(model)
+        if not stats or not stats["received"]:
+            return 0.0
+        return stats["rejected"] / stats["received"]
+
     def generate_questions(self, subject, exam_name, num_questions, difficulty="Medium", avoid_questions=None):
         import datetime
         current_date = datetime.date.today().strftime("%B %Y")
@@ -237,59 +452,6 @@ class QuestionGenerator:
         ]
         
         def attempt_generation_with_retry(model_name, params, retries=1):
-            import time
-            import re
-            
-            def _repair_json(bad_json_str):
-                """Attempts to fix common LLM JSON errors, including truncation and unclosed quotes."""
-                fixed = bad_json_str.strip()
-                
-                # 1. Surgical Backslash Protection
-                # Only double backslashes that are NOT followed by characters that should be escaped in JSON (", \, /, b, f, n, r, t, u)
-                # This prevents breaking \" (escaped quote) while fixing \frac (missing backslash for JSON)
-                
-                def bslash_rep(m):
-                    bs = m.group(1)
-                    char = m.group(2)
-                    # If it's already a valid JSON escape sequence, leave it
-                    if char in '"\\/bfnrtu':
-                        return bs + char
-                    # Otherwise, it might be a LaTeX command like \frac -> needs to be \\frac for JSON
-                    return bs + bs + char
-
-                fixed = re.sub(r'(\\+)(.)', bslash_rep, fixed)
-
-                # 2. Handle unclosed quotes (aware of escaped quotes)
-                quote_count = len(re.findall(r'(?<!\\)"', fixed))
-                if quote_count % 2 != 0:
-                    fixed += '"'
-
-                # 3. Handle truncation: Close objects and the main list
-                if not fixed.endswith(']'):
-                    opens = fixed.count('{')
-                    closes = fixed.count('}')
-                    if opens > closes:
-                        fixed += '}' * (opens - closes)
-                    if not fixed.endswith(']'):
-                        fixed += ']'
-                
-                return fixed
-
-            def _extract_json(content):
-                """Extracts JSON block from response, handling markdown code blocks."""
-                # Try finding JSON in markdown blocks first
-                md_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
-                if md_match:
-                    return md_match.group(1)
-                
-                # Fallback: Greedy from first [ to last ]
-                start = content.find('[')
-                end = content.rfind(']')
-                if start != -1 and end != -1:
-                    return content[start:end+1]
-                
-                return content
-
             current_llm = ChatGroq(
                 temperature=0.2,
                 model_name=model_name,
@@ -303,51 +465,12 @@ class QuestionGenerator:
                     response = current_chain.invoke(params)
                     content = response.content if hasattr(response, 'content') else str(response)
                     
-                    json_str = _extract_json(content)
+                    # Parse (repairing or salvaging single objects if needed), then validate each object
+                    items = _parse_json_list(content)
+                    if items:
+                        return items
+                    logger.error(f"Could not parse any JSON objects from {model_name}.")
                     
-                    try:
-                        return json.loads(json_str)
-                    except json.JSONDecodeError as je:
-                        logger.warning(f"Initial JSON parse failed for {model_name}: {je}. Attempting repair...")
-                        try:
-                            repaired = _repair_json(json_str)
-                            return json.loads(repaired)
-                        except Exception as e:
-                            logger.error(f"Repair failed for {model_name}: {e}")
-                            
-                            # Last ditch: Find all { ... } blocks.
-                            # We use a balanced brace approach since LaTeX uses braces too
-                            try:
-                                valid_qs = []
-                                current_pos = 0
-                                while True:
-                                    s_idx = json_str.find('{', current_pos)
-                                    if s_idx == -1: break
-                                    
-                                    # Find matching closure
-                                    brace_lvl = 0
-                                    e_idx = -1
-                                    for i in range(s_idx, len(json_str)):
-                                        if json_str[i] == '{': brace_lvl += 1
-                                        elif json_str[i] == '}': 
-                                            brace_lvl -= 1
-                                            if brace_lvl == 0:
-                                                e_idx = i
-                                                break
-                                    
-                                    if e_idx != -1:
-                                        obj_str = json_str[s_idx:e_idx+1]
-                                        try:
-                                            # Still need to repair the small block
-                                            rep_obj = _repair_json(obj_str)
-                                            valid_qs.append(json.loads(rep_obj))
-                                        except: pass
-                                        current_pos = e_idx + 1
-                                    else:
-                                        break
-                                if valid_qs: return valid_qs
-                            except: pass
-                            
                 except Exception as e:
                     error_msg = str(e).lower()
                     if "429" in error_msg:
@@ -362,19 +485,6 @@ class QuestionGenerator:
                     break
             return None
 
-        def _is_too_similar(q_text, gathered_questions):
-            """Simple keyword overlap check to prevent same-topic questions."""
-            if not gathered_questions: return False
-            words_new = set(re.findall(r'\w+', q_text.lower()))
-            if len(words_new) < 5: return False # Skip for very short ones
-            
-            for gq in gathered_questions:
-                words_old = set(re.findall(r'\w+', gq['question_text'].lower()))
-                overlap = len(words_new.intersection(words_old)) / max(len(words_new), 1)
-                if overlap > 0.45: # 45% overlap is usually the same sub-topic or formula
-                    return True
-            return False
-
         gathered_questions = []
         max_total_attempts = 3
         total_attempts = 0
@@ -385,16 +495,18 @@ class QuestionGenerator:
         
         while len(gathered_questions) < num_questions and total_attempts < max_total_attempts:
             total_attempts += 1
-            needed = num_questions - len(gathered_questions)
-            
-            # Update avoid_context with what we just gathered to prevent intra-batch repetition
-            current_avoid_list = list(set(avoid_questions + [q['question_text'] for q in gathered_questions]))
-            avoid_list_str = "\n".join([f"- {q[:60]}..." for q in current_avoid_list[-100:]])
-            local_avoid_context = f"\nCRITICAL: AVOID THESE RECENT TOPICS (TEXT PREFIXES):\n{avoid_list_str}\n"
+            # On later rounds, try the models that have been rejecting the fewest objects first
+            round_models = models if total_attempts == 1 else sorted(models, key=self._rejection_rate)
+
+            for model in round_models:
+                # Ask only for the exact shortfall, avoiding everything gathered so far
+                needed = num_questions - len(gathered_questions)
+                current_avoid_list = list(set(avoid_questions + [q['question_text'] for q in gathered_questions]))
+                avoid_list_str = "\n".join([f"- {q[:60]}..." for q in current_avoid_list[-100:]])
+                local_avoid_context = f"\nCRITICAL: AVOID THESE RECENT TOPICS (TEXT PREFIXES):\n{avoid_list_str}\n"
 
-            for model in models:
                 logger.info(f"Attempting to gather {needed} questions using {model} (Attempt {total_attempts})...")
-                new_qs = attempt_generation_with_retry(model, {
+                items = attempt_generation_with_retry(model, {
                     "subject": subject,
                     "exam_name": exam_name,
                     "num_questions": needed,
@@ -402,21 +514,30 @@ class QuestionGenerator:
                     "current_date": current_date,
                     "avoid_context": local_avoid_context
                 })
-                
-                if new_qs and isinstance(new_qs, list):
-                    for q in new_qs:
-                        if len(gathered_questions) >= num_questions: break
-                        if not _is_too_similar(q['question_text'], gathered_questions):
-                            gathered_questions.append(q)
-                        else:
-                            logger.info(f"Rejected similar question: {q['question_text'][:50]}...")
-                    
-                    if len(gathered_questions) >= num_questions:
-                        break
-            
-            if len(gathered_questions) >= num_questions:
-                break
+                stats = self.stats.setdefault(model, {"calls": 0, "received": 0, "accepted": 0, "rejected": 0, "similar": 0, "reasons": Counter()})
+                stats["calls"] += 1
+                if not items:
+                    continue
+
+                new_qs, rejected = _validate_questions(items)
+                stats["received"] += len(items)
+                stats["rejected"] += sum(rejected.values())
+                stats["reasons"].update(rejected)
+                if rejected:
+                    logger.warning(f"{model}: rejected {sum(rejected.values())} of {len(items)} objects: {dict(rejected)}")
+                for q in new_qs:
+                    if len(gathered_questions) >= num_questions: break
+                    if not _is_too_similar(q['question_text'], gathered_questions):
+                        gathered_questions.append(q)
+                        stats["accepted"] += 1
+                    else:
+                        stats["similar"] += 1
+                        logger.info(f"Rejected similar question: {q['question_text'][:50]}...")
 
+                if len(gathered_questions) >= num_questions:
+                    break
+
+        logger.info(f"Generation stats: {self.stats}")
         if gathered_questions:
             # Clean and add unique IDs
             final_qs = gathered_questions[:num_questions]
@@ -436,9 +557,16 @@ class QuestionGenerator:
         logger.error("Final result: Failed to gather any valid questions.")
         return []
 
-    def translate_questions(self, questions, target_language):
-        """Translates a list of questions into the target language using LLM."""
-        if not target_language or target_language.lower() == "english":
+    def translate_questions(self, questions, target_language, allow_partial=True):
+        """Translates a list of questions into the target language using LLM.
+
+        Questions are split into chunks of about TRANSLATION_CHUNK_TOKENS and translated
+        concurrently, so long papers neither get truncated nor take longer than their largest
+        chunk. Each chunk is retried on its own; a chunk that still fails stays in English.
+        With allow_partial=False any failed chunk fails the whole call, and the input list
+        itself is returned, as when nothing could be translated.
+        """
+        if not questions or not target_language or target_language.lower() == "english":
             return questions
 
         prompt = ChatPromptTemplate.from_template(
@@ -448,8 +576,8 @@ class QuestionGenerator:
             IMPORTANT: 
             1. Translate everything EXCEPT LaTeX formulas/expressions (e.g., $E=mc^2$). Keep LaTeX EXACTLY as is, including tags like $ or $$.
             2. CRITICAL: NEVER use LaTeX markers like \bar{{}}, \acute{{}}, or \bar{{s}} for phonetic romanization or Indian language terms. Write the words in their natural local script (Hindi, Marathi, etc.) or plain English.
-            3. Maintain the EXACT same JSON structure.
-            4. Ensure the 'correct_option' field remains (A, B, C, or D).
+            3. Maintain the EXACT same JSON structure: a list of exactly {count} objects in the same order.
+            4. Keep the 'id' and 'correct_option' fields EXACTLY as they are.
             5. Translate 'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'explanation', and 'appeared_in'.
             
             Questions to translate:
@@ -458,26 +586,49 @@ class QuestionGenerator:
             Return ONLY the translated raw JSON.
             """
         )
+        chain = prompt | self.llm
+        source = [dict(q) for q in questions]
+        chunks = _chunk_questions(source, TRANSLATION_CHUNK_TOKENS)
 
-        chain = prompt | self.llm | self.parser
-        
-        try:
-            translated_questions = chain.invoke({
-                "target_language": target_language,
-                "questions_json": json.dumps(questions, ensure_ascii=False)
-            })
-            
-            if isinstance(translated_questions, list):
-                # Clean LaTeX in translated content
-                for q in translated_questions:
-                    for key in ['question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'explanation']:
-                        if key in q:
-                            q[key] = self._clean_latex(q[key])
-                return translated_questions
-        except Exception as e:
-            print(f"Translation Error: {e}")
-            
-        return questions
+        def translate_chunk(chunk):
+            for attempt in range(TRANSLATION_RETRIES + 1):
+                try:
+                    response = chain.invoke({
+                        "target_language": target_language,
+                        "count": len(chunk),
+                        "questions_json": json.dumps(chunk, ensure_ascii=False)
+                    })
+                    content = response.content if hasattr(response, 'content') else str(response)
+                    translated = _validate_translation(chunk, _parse_json_list(content))
+                    if translated is not None:
+                        return translated
+                    logger.warning(f"Translation chunk ({chunk[0]['id']}..{chunk[-1]['id']}) into {target_language} failed validation (attempt {attempt + 1}).")
+                except Exception as e:
+                    if "429" in str(e):
+                        time.sleep((attempt + 1) * 3)
+                    logger.warning(f"Translation chunk into {target_language} errored (attempt {attempt + 1}): {e}")
+            return None
+
+        with ThreadPoolExecutor(max_workers=min(TRANSLATION_WORKERS, len(chunks))) as pool:
+            results = list(pool.map(translate_chunk, chunks))
+
+        if not any(results):
+            print(f"Translation Error: no chunk of {len(chunks)} could be translated into {target_language}.")
+            return questions
+        if not allow_partial and not all(results):
+            print(f"Translation Error: {results.count(None)} of {len(chunks)} chunks could not be translated into {target_language}.")
+            return questions
+        merged = []
+        for chunk, translated in zip(chunks, results):
+            if translated is None:
+                logger.error(f"Keeping {len(chunk)} questions ({chunk[0]['id']}..{chunk[-1]['id']}) in English; translation into {target_language} failed.")
+            merged.extend(translated or chunk)
+        # Clean LaTeX in translated content
+        for q in merged:
+            for key in ['question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'explanation']:
+                if key in q:
+                    q[key] = self._clean_latex(q[key])
+        return merged
 
 # Simple test block
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
 import streamlit as st
 from student import student_view
+from invigilator import invigilator_view
 
 st.set_page_config(page_title="Proctored Exam System", layout="wide")
 
 def main():
-    student_view()
+    if st.session_state.get("role") == "invigilator":
+        invigilator_view()
+    else:
+        student_view()
 
 if __name__ == "__main__":
     main()
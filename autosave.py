@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from database import append_attempt_deltas, finalize_attempt
+
+logger = logging.getLogger(__name__)
+
+AUTOSAVE_INTERVAL_SECONDS = 5
+
+class AttemptAutosaver:
+    """Write-behind buffer for answer changes.
+
+    Clicks are coalesced per attempt and question (only the latest choice survives) and a
+    single background thread flushes every attempt's pending deltas on a fixed interval.
+    Submitting finalizes the attempt: the deltas still buffered go out with the update that closes it.
+    """
+
+    def __init__(self, interval=AUTOSAVE_INTERVAL_SECONDS, writer=append_attempt_deltas, finalizer=finalize_attempt):
+        self.interval = interval
+        self.writer = writer
+        self.finalizer = finalizer
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="attempt-autosave", daemon=True)
+            self._thread.start()
+
+    def record(self, attempt_id, question_id, choice):
+        with self._lock:
+            self._pending.setdefault(attempt_id, {})[question_id] = {
+                "question_id": question_id, "choice": choice, "at": datetime.now()
+            }
+
+    def drain(self, attempt_id):
+        """Removes and returns the buffered deltas for one attempt."""
+        with self._lock:
+            return list(self._pending.pop(attempt_id, {}).values())
+
+    def finalize(self, attempt_id, fields):
+        """Writes the attempt's buffered deltas and closes it with `fields` in one update. Returns True on success."""
+        deltas = self.drain(attempt_id)
+        try:
+            self.finalizer(attempt_id, deltas, fields)
+            return True
+        except Exception as e:
+            # The queued submission still carries every answer and closes the attempt when it is stored
+            logger.warning(f"Finalizing attempt {attempt_id} failed: {e}")
+            return False
+
+    def flush(self, attempt_id=None):
+        with self._lock:
+            if attempt_id is None:
+                batches, self._pending = self._pending, {}
+            else:
+                batches = {attempt_id: self._pending.pop(attempt_id, {})}
+        for a_id, deltas in batches.items():
+            if not deltas: continue
+            try:
+                self.writer(a_id, list(deltas.values()))
+            except Exception as e:
+                logger.warning(f"Autosave failed for attempt {a_id}: {e}")
+                self._requeue(a_id, deltas)
+
+    def _requeue(self, attempt_id, deltas):
+        # Newer clicks recorded while the write was failing take precedence
+        with self._lock:
+            current = self._pending.setdefault(attempt_id, {})
+            for question_id, delta in deltas.items():
+                current.setdefault(question_id, delta)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+_autosaver = None
+_autosaver_lock = threading.Lock()
+
+def get_autosaver():
+    """Returns the process-wide autosaver, starting its flush thread on first use."""
+    global _autosaver
+    with _autosaver_lock:
+        if _autosaver is None:
+            _autosaver = AttemptAutosaver()
+            _autosaver.start()
+    return _autosaver
@@ -0,0 +1,151 @@
+"""Offline micro-benchmarks for the post-processing that runs on every generated exam.
+
+No network or API key is needed: raw LLM responses are rebuilt from the checked-in
+corpus at each question count and fed straight into the parsing/cleaning helpers.
+
+    python benchmarks/bench_ai_generator.py
+    python benchmarks/bench_ai_generator.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_ai_generator.py --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_generator import (
+    QuestionGenerator, _extract_json, _repair_json, _scan_json_objects, _is_too_similar,
+    _parse_json_list, _validate_questions
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "llm_responses.json")
+DEFAULT_SIZES = [10, 50, 200]
+TEXT_KEYS = ['question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'explanation']
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["responses"]
+
+
+def build_response(entry, num_questions):
+    """Renders a raw response with `num_questions` objects in the corpus entry's style."""
+    objects = entry["objects"]
+    items = [objects[i % len(objects)].replace("@@N@@", str(i + 1)) for i in range(num_questions)]
+    raw = entry["wrapper"].replace("{items}", ",\n".join(items))
+    if entry.get("truncate"):
+        raw = raw[:-entry["truncate"]]
+    return raw
+
+
+def parse_questions(raw):
+    """The parse/repair/scan fallback chain used in generate_questions."""
+    return _parse_json_list(raw) or []
+
+
+def build_cases(corpus, sizes):
+    # The cleaning helpers never touch the LLM client, so skip __init__ (and its API key check).
+    gen = QuestionGenerator.__new__(QuestionGenerator)
+    cases = []
+    for kind, entry in corpus.items():
+        for size in sizes:
+            raw = build_response(entry, size)
+            json_str = _extract_json(raw)
+            parsed = parse_questions(raw)
+            questions = [q for q in parsed if isinstance(q, dict)]
+            texts = [q[k] for q in questions for k in TEXT_KEYS if isinstance(q.get(k), str)]
+            options = [q[k] for q in questions for k in TEXT_KEYS[1:5] if k in q]
+            explanations = [q.get('explanation') for q in questions]
+            q_texts = [q.get('question_text', '') for q in questions]
+
+            def run_similarity(q_texts=q_texts):
+                gathered = []
+                for text in q_texts:
+                    if not _is_too_similar(text, gathered):
+                        gathered.append({'question_text': text})
+                return gathered
+
+            cases += [
+                ("_extract_json", kind, size, lambda raw=raw: _extract_json(raw)),
+                ("_repair_json", kind, size, lambda s=json_str: _repair_json(s)),
+                ("_scan_json_objects", kind, size, lambda s=json_str: _scan_json_objects(s)),
+                ("_validate_questions", kind, size, lambda p=parsed: _validate_questions(p)),
+                ("_clean_latex", kind, size, lambda t=texts: [gen._clean_latex(x) for x in t]),
+                ("_strip_option_label", kind, size, lambda o=options: [gen._strip_option_label(x) for x in o]),
+                ("_clean_explanation", kind, size, lambda e=explanations: [gen._clean_explanation(x) for x in e]),
+                ("_is_too_similar", kind, size, run_similarity),
+            ]
+    return cases
+
+
+def measure(fn, min_time):
+    """Returns (ops/sec, peak KiB allocated during a single call)."""
+    fn()  # warm up regex caches
+    iterations = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        fn()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+    ops = iterations / elapsed
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ops, (peak - base) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ai_generator post-processing offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Question counts per response")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to run each case")
+    parser.add_argument("--only", help="Run only functions whose name contains this string")
+    parser.add_argument("--baseline", help="JSON file of previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed ops/sec drop vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="Write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'function':<22}{'corpus':<13}{'n':>5}{'ops/sec':>14}{'peak KiB':>12}{'vs base':>10}")
+    for name, kind, size, fn in build_cases(load_corpus(), args.sizes):
+        if args.only and args.only not in name:
+            continue
+        ops, kib = measure(fn, args.min_time)
+        key = f"{name}/{kind}/{size}"
+        results[key] = {"ops_per_sec": ops, "peak_kib": kib}
+
+        change = ""
+        if key in baseline:
+            ratio = ops / baseline[key]["ops_per_sec"]
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio < 1 - args.threshold:
+                regressions.append((key, ratio))
+        print(f"{name:<22}{kind:<13}{size:>5}{ops:>14,.1f}{kib:>12.1f}{change:>10}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}:")
+        for key, ratio in regressions:
+            print(f"  {key}: {ratio:.2f}x baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Start-time latency when a whole cohort joins a scheduled exam at once (no database needed).
+
+Every candidate thread waits on a barrier, then joins end to end, as join_scheduled_exam
+does: it fetches the prepared paper, builds its own shuffled view, creates its attempt
+and writes its exam state to the shared session store. The "join" path is
+cohort.join_schedule, where one loader reads the paper and the attempt only references
+it. The "legacy" path is the previous join: it reads the paper on every join and stores
+the candidate's questions with the attempt. The store is an in-memory stand-in with a
+fixed per-query latency and a connection pool limit. Reads and writes are counted, with
+one write per document touched.
+
+    python benchmarks/bench_cohort_join.py --candidates 1000 --questions 20 --shuffle-options
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cohort
+from bson import ObjectId
+from constants import SUPPORTED_LANGUAGES
+from database import store_questions, start_attempt
+from question_model import localize_questions, intern_questions
+from session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+class _InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class _Collection:
+    def __init__(self, store):
+        self.store = store
+        self.docs = {}
+
+    def _query(self, writes=0):
+        with self.store.pool:
+            time.sleep(self.store.latency)
+        with self.store.lock:
+            if writes:
+                self.store.writes += writes
+            else:
+                self.store.reads += 1
+
+    def find_one(self, query, projection=None):
+        self._query()
+        return self.docs.get(query["_id"])
+
+    def find(self, query, projection=None):
+        self._query()
+        return [dict(self.docs[h], _id=h) for h in query["_id"]["$in"] if h in self.docs]
+
+    def bulk_write(self, ops, ordered=True):
+        self._query(writes=len(ops))
+
+    def insert_one(self, doc):
+        self._query(writes=1)
+        return _InsertResult(ObjectId())
+
+
+class SyntheticStore:
+    """Just enough of a database for a join: schedules, the question store and attempts."""
+
+    def __init__(self, latency, pool_size):
+        self.latency = latency
+        self.pool = threading.BoundedSemaphore(pool_size)
+        self.lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.exam_schedules = _Collection(self)
+        self.questions = _Collection(self)
+        self.exam_attempts = _Collection(self)
+
+
+def make_schedule(store, num_questions, shuffle_options):
+    originals = intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i} about $x^{i}$?", "option_a": f"a{i}", "option_b": f"b{i}",
+         "option_c": f"c{i}", "option_d": f"d{i}", "correct_option": "ABCD"[i % 4], "explanation": f"Because {i}."}
+        for i in range(num_questions)
+    ])
+    papers = {"English": originals}
+    for language in SUPPORTED_LANGUAGES[1:]:
+        papers[language] = localize_questions(originals, [dict(q.to_dict(), question_text=f"[{language}] {q['question_text']}") for q in originals], language)
+    paper_refs = {}
+    for language, questions in papers.items():
+        paper_refs[language] = store_questions(questions, db=None)
+        for ref, q in zip(paper_refs[language], questions):
+            store.questions.docs[ref['hash']] = q.to_dict()
+    now = datetime.now()
+    schedule = {
+        "_id": "bench", "exam_name": "UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "num_questions": num_questions, "timer_minutes": 30, "starts_at": now, "join_until": now + timedelta(minutes=15),
+        "languages": SUPPORTED_LANGUAGES[1:], "shuffle_questions": True, "shuffle_options": shuffle_options,
+        "status": "ready", "paper": paper_refs
+    }
+    store.exam_schedules.docs["bench"] = schedule
+    return schedule
+
+
+def join(store, sessions, schedule, candidate, language):
+    state = cohort.join_schedule(schedule, candidate, language, db=store)
+    sessions.update(candidate, lambda current: state)
+
+
+def legacy_join(store, sessions, schedule, candidate, language):
+    paper = cohort._load_paper(schedule["_id"], store)
+    original_questions, exam_questions = paper.for_candidate(candidate, language)
+    attempt_id = start_attempt({
+        "student_name": candidate, "schedule_id": schedule["_id"], "language": language,
+        "start_time": schedule["starts_at"].timestamp(),
+        "original_questions": original_questions, "exam_questions": exam_questions
+    }, db=store)
+    sessions.update(candidate, lambda current: {
+        "original_questions": original_questions, "exam_questions": exam_questions,
+        "student_responses": {}, "current_q_index": 0, "attempt_id": attempt_id
+    })
+
+
+def run_joins(candidates, join_one):
+    barrier = threading.Barrier(candidates)
+    latencies = [0.0] * candidates
+
+    def candidate(n):
+        barrier.wait()
+        start = time.perf_counter()
+        join_one(n)
+        latencies[n] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=candidate, args=(n,)) for n in range(candidates)]
+    wall = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return sorted(latencies), time.perf_counter() - wall
+
+
+def report(label, latencies, wall, store):
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{label:<8}{pct(0.50):>9.1f}{pct(0.95):>9.1f}{pct(0.99):>9.1f}{latencies[-1] * 1000:>9.1f}"
+          f"{wall:>9.2f}{store.reads:>9,}{store.writes:>9,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simultaneous joins of a cohort exam.")
+    parser.add_argument("--candidates", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated latency per store query")
+    parser.add_argument("--pool-size", type=int, default=100, help="Concurrent store queries allowed (pymongo's default pool)")
+    parser.add_argument("--shuffle-options", action="store_true")
+    parser.add_argument("--session-backend", choices=["sqlite", "memory"], default="sqlite",
+                        help="Where exam state is written on join (sqlite: a shared file, as with several replicas)")
+    args = parser.parse_args()
+
+    languages = SUPPORTED_LANGUAGES
+    print(f"{args.candidates:,} candidates, {args.questions} questions, {len(languages)} languages, "
+          f"{args.latency_ms:.0f} ms/query, pool {args.pool_size}, option shuffle {'on' if args.shuffle_options else 'off'}, "
+          f"{args.session_backend} session store")
+    print(f"{'path':<8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'wall s':>9}{'reads':>9}{'writes':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, join_one in [("join", join), ("legacy", legacy_join)]:
+            store = SyntheticStore(args.latency_ms / 1000, args.pool_size)
+            schedule = make_schedule(store, args.questions, args.shuffle_options)
+            if args.session_backend == "sqlite":
+                sessions = SQLiteSessionStore(os.path.join(tmp, f"{label}.db"))
+            else:
+                sessions = InMemorySessionStore()
+            cohort._papers.clear()
+            latencies, wall = run_joins(args.candidates, lambda n: join_one(store, sessions, schedule, f"student_{n}", languages[n % len(languages)]))
+            report(label, latencies, wall, store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Throughput of regrade on synthetic submissions.
+
+By default no database is needed: it times the per-batch work regrade_submissions does
+after the cursor returns documents (flattening the affected (submission, question) pairs
+and computing score deltas with NumPy), next to the equivalent pure-Python loop.
+
+With --mongo-uri it also seeds a throwaway database on that server and times
+regrade_submissions end to end: the $in cursor, scoring, the bulk_write of scores and
+histograms and the question store update. The database is dropped afterwards.
+
+    python benchmarks/bench_regrade.py --submissions 100000 --batch-size 5000
+    python benchmarks/bench_regrade.py --submissions 100000 --mongo-uri mongodb://localhost:27017
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from regrade import compute_score_deltas, _flatten_batch, regrade_submissions
+
+
+def make_submissions(num_submissions, questions_per_exam, bank_size, seed=7):
+    rng = random.Random(seed)
+    bank = [f"{i:064x}" for i in range(bank_size)]
+    docs = []
+    for n in range(num_submissions):
+        refs = [{"id": f"ai_q_{i}", "hash": h} for i, h in enumerate(rng.sample(bank, questions_per_exam))]
+        docs.append({"_id": n, "question_refs": refs, "user_responses": {r['id']: rng.choice("ABCD") for r in refs if rng.random() < 0.9}})
+    return bank, docs
+
+
+def python_deltas(docs, corrections, old_keys):
+    deltas = []
+    for doc in docs:
+        delta = 0
+        for ref in doc['question_refs']:
+            if ref['hash'] in corrections:
+                chosen = doc['user_responses'].get(ref['id'])
+                delta += (chosen == corrections[ref['hash']]) - (chosen == old_keys[ref['hash']])
+        deltas.append(delta)
+    return deltas
+
+
+def run_end_to_end(client, uri, bank, docs, corrections, batch_size):
+    """Seeds a throwaway database on `client` and runs regrade_submissions against it. Returns (report, seed seconds)."""
+    name = f"bench_regrade_{os.getpid()}"
+    os.environ.update(MONGO_URI=uri, DB_NAME=name)
+    database._client = client
+    db = client[name]
+    try:
+        start = time.perf_counter()
+        db.questions.insert_many([{"_id": h, "question_text": f"Question {h[-6:]}?", "correct_option": "A"} for h in bank])
+        for i in range(0, len(docs), 10_000):
+            db.student_submissions.insert_many([
+                dict(d, exam_id="ai_generated_UPSC CSE", subject="Polity", difficulty="Medium", total_questions=len(d['question_refs']),
+                     score=0, percentage=0)
+                for d in docs[i:i + 10_000]
+            ])
+        db.student_submissions.create_index("question_refs.hash")
+        db.student_submissions.create_index("original_refs.hash")
+        seeded = time.perf_counter() - start
+        return regrade_submissions(corrections, batch_size=batch_size), seeded
+    finally:
+        client.drop_database(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized regrade core.")
+    parser.add_argument("--submissions", type=int, default=100_000)
+    parser.add_argument("--questions", type=int, default=20, help="Questions per submission")
+    parser.add_argument("--bank-size", type=int, default=500, help="Distinct questions across all exams")
+    parser.add_argument("--corrections", type=int, default=10, help="Number of corrected answer keys")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--mongo-uri", help="Also time regrade_submissions end to end on this server (uses a throwaway database)")
+    args = parser.parse_args()
+
+    bank, docs = make_submissions(args.submissions, args.questions, args.bank_size)
+    old_keys = {h: "A" for h in bank}
+    corrections = {h: "B" for h in bank[:args.corrections]}
+    # The server-side $in filter only returns submissions containing a corrected question
+    affected = [d for d in docs if any(r['hash'] in corrections for r in d['question_refs'])]
+    print(f"{len(affected):,} of {len(docs):,} submissions contain a corrected question")
+
+    flatten = score = 0.0
+    total = 0
+    for i in range(0, len(affected), args.batch_size):
+        batch = affected[i:i + args.batch_size]
+        t0 = time.perf_counter()
+        arrays = _flatten_batch(batch, corrections, old_keys)
+        t1 = time.perf_counter()
+        total += int(compute_score_deltas(*arrays, num_rows=len(batch)).sum())
+        t2 = time.perf_counter()
+        flatten += t1 - t0
+        score += t2 - t1
+
+    start = time.perf_counter()
+    expected = sum(python_deltas(affected, corrections, old_keys))
+    loop = time.perf_counter() - start
+
+    assert total == expected, (total, expected)
+    n = len(affected)
+    print(f"  flatten        : {flatten:6.3f}s  ({n / flatten:>12,.0f} submissions/s)")
+    print(f"  numpy scoring  : {score:6.3f}s  ({n / score:>12,.0f} submissions/s)")
+    print(f"  total (batched): {flatten + score:6.3f}s  ({n / (flatten + score):>12,.0f} submissions/s)")
+    print(f"  python loop    : {loop:6.3f}s  ({n / loop:>12,.0f} submissions/s)")
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        report, seeded = run_end_to_end(MongoClient(args.mongo_uri), args.mongo_uri, bank, docs, corrections, args.batch_size)
+        print(f"end to end on {args.mongo_uri} ({len(docs):,} submissions seeded in {seeded:.1f}s):")
+        print(f"  regrade        : {report['elapsed_seconds']:6.3f}s  ({report['submissions_per_second']:>12,.0f} submissions/s), "
+              f"{report['matched']:,} matched, {report['updated']:,} updated, {report['score_changes']:,} score changes")
+
+
+if __name__ == "__main__":
+    main()
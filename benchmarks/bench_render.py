@@ -0,0 +1,121 @@
+"""Rerun render time of the results review and the in-exam question palette (no database needed).
+
+Each page is run headless with Streamlit's AppTest: once cold, then --reruns more times the
+way a student's clicks rerun it. The results review is compared with the previous
+one-element-per-line rendering of every question, which is kept here as the baseline.
+
+    python benchmarks/bench_render.py --questions 10 50 --reruns 20
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Keep the pages offline: no database lookups for percentile, leaderboard or attempts
+os.environ["MONGO_URI"] = ""
+
+from streamlit.testing.v1 import AppTest
+from question_model import intern_questions
+import student  # noqa: F401  (import once up front so the first "cold" run measures rendering, not imports)
+
+# Bare-mode AppTest runs log context and deprecation warnings on every element
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+HEADER = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+"""
+
+RESULTS_SCRIPT = HEADER + """
+from student import results_view
+results_view(st.session_state.exam_questions)
+"""
+
+LEGACY_RESULTS_SCRIPT = HEADER + """
+questions = st.session_state.exam_questions
+res = st.session_state.student_responses
+for i, q in enumerate(questions):
+    chosen = res.get(q['id'])
+    correct = q['correct_option']
+    with st.container(border=True):
+        st.markdown(f"**Question {i+1}:**  \\n{q['question_text']}")
+        if q.get('appeared_in'):
+            st.caption(f"Source: {q['appeared_in']}")
+        options = {"A": q['option_a'], "B": q['option_b'], "C": q['option_c'], "D": q['option_d']}
+        for key, val in options.items():
+            label = f"({key}) {val}"
+            if key == correct:
+                st.write(f"✅ **{label} (Correct Answer)**")
+            elif key == chosen:
+                st.write(f"❌ ~~{label} (Your Choice)~~")
+            else:
+                st.write(f"&nbsp;&nbsp;&nbsp;&nbsp;{label}")
+        st.info(f"**Explanation:**\\n\\n{q.get('explanation', 'No explanation available.')}")
+"""
+
+SESSION_SCRIPT = HEADER + """
+from student import exam_session_view
+exam_session_view(st.session_state.exam_questions, st.session_state.exam_config)
+"""
+
+
+def make_questions(n):
+    return intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"If $x^2 + {i}x = {i * 3}$, which statement about $x$ holds for case {i}?",
+         "option_a": f"$x = {i}$", "option_b": f"$x = -{i}$", "option_c": f"$x = \\frac{{{i}}}{{2}}$", "option_d": "None of these",
+         "correct_option": "ABCD"[i % 4], "appeared_in": f"Mock {2020 + i % 5}",
+         "explanation": "1. Rearrange the equation.  \n2. Factor the quadratic.  \n3. Check each option against the roots."}
+        for i in range(n)
+    ])
+
+
+def prepare(script, questions):
+    at = AppTest.from_string(script, default_timeout=60)
+    at.session_state["username"] = "bench"
+    at.session_state["exam_questions"] = questions
+    at.session_state["original_questions"] = questions
+    at.session_state["student_responses"] = {q['id']: "ABCD"[(i + 1) % 4] for i, q in enumerate(questions) if i % 3}
+    at.session_state["exam_config"] = {"subject": "Mathematics", "exam_name": "JEE Main", "timer_minutes": 60, "difficulty": "Hard"}
+    at.session_state["current_language"] = "English"
+    at.session_state["current_q_index"] = 0
+    at.session_state["start_time"] = time.time()
+    at.session_state["last_score"] = len(questions) // 2
+    at.session_state["percentile_rank"] = (None, 0)
+    return at
+
+
+def measure(script, questions, reruns):
+    at = prepare(script, questions)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    start = time.perf_counter()
+    for _ in range(reruns):
+        at.run()
+    warm = (time.perf_counter() - start) / reruns
+    return cold * 1000, warm * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rerun render time of exam pages.")
+    parser.add_argument("--questions", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [("results review (legacy)", LEGACY_RESULTS_SCRIPT), ("results review", RESULTS_SCRIPT), ("exam page + palette", SESSION_SCRIPT)]
+    print(f"{'page':<26}{'questions':>10}{'cold ms':>10}{'rerun ms':>10}")
+    for n in args.questions:
+        questions = make_questions(n)
+        for label, script in pages:
+            cold, warm = measure(script, questions, args.reruns)
+            print(f"{label:<26}{n:>10}{cold:>10.1f}{warm:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measures question memory for many concurrent sessions sitting the same paper.
+
+"before" keeps what each session held previously: its own list of plain dicts for
+original_questions plus a full translated copy in exam_questions. "after" interns both
+through question_model, so every session only holds references.
+
+    python benchmarks/bench_session_memory.py --sessions 1000 --questions 50
+"""
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_model import intern_questions, localize_questions
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "llm_responses.json")
+
+
+def make_paper(num_questions):
+    """Returns (english_json, hindi_json) for one paper, as a session would receive them."""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        responses = json.load(f)["responses"]
+
+    def questions(kind):
+        objects = responses[kind]["objects"]
+        # The corpus keeps the models' raw LaTeX escapes; double them so plain json can read it
+        raw = [objects[i % len(objects)].replace("@@N@@", str(i + 1)).replace("\\", "\\\\") for i in range(num_questions)]
+        return [json.loads(r) for r in raw]
+
+    english, hindi = questions("clean"), questions("indic")
+    for i, (en, hi) in enumerate(zip(english, hindi)):
+        en['id'] = hi['id'] = f"ai_q_{i}"
+        hi['correct_option'] = en['correct_option']
+    return json.dumps(english, ensure_ascii=False), json.dumps(hindi, ensure_ascii=False)
+
+
+def run(num_sessions, english_json, hindi_json, interned):
+    """Builds per-session state the way student.py does and returns (bytes, sessions)."""
+    tracemalloc.start()
+    sessions = []
+    for _ in range(num_sessions):
+        # Every session parses its own copy, as it would after loading from the store or cache
+        original = json.loads(english_json)
+        translated = json.loads(hindi_json)
+        if interned:
+            original = intern_questions(original)
+            translated = localize_questions(original, translated, "Hindi")
+        sessions.append({"original_questions": original, "exam_questions": translated, "student_responses": {}})
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session question memory, before and after interning.")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args()
+
+    english_json, hindi_json = make_paper(args.questions)
+    before, kept = run(args.sessions, english_json, hindi_json, interned=False)
+    del kept
+    after, kept = run(args.sessions, english_json, hindi_json, interned=True)
+
+    print(f"{args.sessions} sessions x {args.questions} questions (English + Hindi)")
+    print(f"  plain dicts : {before / 2**20:8.1f} MiB  ({before / args.sessions / 1024:.1f} KiB/session)")
+    print(f"  interned    : {after / 2**20:8.1f} MiB  ({after / args.sessions / 1024:.1f} KiB/session)")
+    print(f"  reduction   : {before / max(after, 1):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
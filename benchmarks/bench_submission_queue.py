@@ -0,0 +1,120 @@
+"""End-of-exam burst through the durable submission queue (no database needed).
+
+Candidate threads enqueue realistic submissions at a fixed total rate while the drainer
+runs, writing batches to a stand-in for insert_many with a fixed per-batch latency and an
+optional failure rate. Reports how long submitting took for candidates (enqueue
+acknowledgement), how deep the queue got, how long it took to empty after the burst,
+and checks that every submission was stored exactly once.
+
+    python benchmarks/bench_submission_queue.py --submissions 5000 --burst-seconds 10 --fail-rate 0.05
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from submission_queue import SubmissionQueue
+
+
+class SyntheticWriter:
+    """Stands in for insert_submissions: keyed storage, per-batch latency, random failures."""
+
+    def __init__(self, latency, fail_rate, seed=7):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.stored = {}
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, submissions):
+        time.sleep(self.latency)
+        with self.lock:
+            self.batches += 1
+            if self.rng.random() < self.fail_rate:
+                raise ConnectionError("simulated network error")
+            for s in submissions:
+                self.stored[s['_id']] = self.stored.get(s['_id'], 0) + 1
+        return []
+
+
+def make_submission(n, questions):
+    attempt_id = ObjectId()
+    return {
+        "_id": attempt_id, "attempt_id": attempt_id, "student_name": f"student_{n}", "student_email": "",
+        "exam_id": "cohort_bench", "subject": "Polity", "difficulty": "Medium", "score": n % questions,
+        "total_questions": questions, "violation": None, "submission_time": datetime.now(),
+        "question_refs": [{"id": f"ai_q_{i}", "hash": f"{i:064x}"} for i in range(questions)],
+        "user_responses": {f"ai_q_{i}": "ABCD"[(n + i) % 4] for i in range(questions)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the submission ingest queue under a burst.")
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--burst-seconds", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=50, help="Concurrent candidate sessions submitting")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--write-latency-ms", type=float, default=50.0, help="Simulated insert_many latency per batch")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of batch writes that fail and are retried")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    writer = SyntheticWriter(args.write_latency_ms / 1000, args.fail_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SubmissionQueue(os.path.join(tmp, "queue.db"), writer=writer, batch_size=args.batch_size, interval=0.1)
+        queue.start()
+        acks = []
+        acks_lock = threading.Lock()
+        max_depth = 0
+        per_thread = args.submissions // args.threads
+        gap = args.burst_seconds / per_thread
+        keys = []
+
+        def candidate_thread(t):
+            # Stagger the threads so the total rate is even across the burst
+            time.sleep(gap * t / args.threads)
+            for i in range(per_thread):
+                sub = make_submission(t * per_thread + i, args.questions)
+                start = time.perf_counter()
+                key = queue.enqueue(sub)
+                elapsed = time.perf_counter() - start
+                with acks_lock:
+                    acks.append(elapsed)
+                    keys.append(key)
+                time.sleep(max(0.0, gap - elapsed))
+
+        threads = [threading.Thread(target=candidate_thread, args=(t,)) for t in range(args.threads)]
+        burst_start = time.perf_counter()
+        for t in threads: t.start()
+        while any(t.is_alive() for t in threads):
+            max_depth = max(max_depth, queue.pending_count())
+            time.sleep(0.05)
+        burst_end = time.perf_counter()
+        while queue.pending_count():
+            time.sleep(0.01)
+        drained = time.perf_counter()
+
+    acks.sort()
+    pct = lambda p: acks[min(len(acks) - 1, int(len(acks) * p))] * 1000
+    total = len(keys)
+    print(f"{total:,} submissions over {burst_end - burst_start:.1f}s from {args.threads} sessions "
+          f"({args.write_latency_ms:.0f} ms/batch write, {args.fail_rate:.0%} failing)")
+    print(f"enqueue ack    p50 {pct(0.50):.2f} ms   p95 {pct(0.95):.2f} ms   p99 {pct(0.99):.2f} ms   max {acks[-1] * 1000:.2f} ms")
+    print(f"queue depth    max {max_depth:,}   drained {drained - burst_end:.2f}s after the burst   {writer.batches:,} batch writes")
+    stored_once = sum(1 for k in keys if writer.stored.get(k) == 1)
+    missing = sum(1 for k in keys if k not in writer.stored)
+    print(f"stored         {len(writer.stored):,} unique, {stored_once:,} exactly once, {missing} missing")
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import logging
+import random
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from database import get_db, store_questions, get_questions_by_hash, question_from_ref, start_attempt
+from question_model import OPTION_KEYS, intern_question, intern_questions, localize_questions, permute_options
+from constants import SUPPORTED_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+PREPARE_AHEAD_MINUTES = 60
+JOIN_WINDOW_MINUTES = 15
+PREPARE_LEASE_MINUTES = 30
+TRANSLATION_ATTEMPTS = 2
+# How long a "not ready yet" answer is reused before the store is asked again
+NOT_READY_RETRY_SECONDS = 5
+
+def create_schedule(exam_name, subject, difficulty, num_questions, timer_minutes, starts_at,
+                    languages=None, shuffle_questions=True, shuffle_options=False, join_window_minutes=JOIN_WINDOW_MINUTES):
+    """Registers a cohort exam. Its paper is generated later by prepare_due_schedules."""
+    db = get_db()
+    if db is None: return None
+    languages = [lang for lang in (languages or SUPPORTED_LANGUAGES) if lang != "English"]
+    return db.exam_schedules.insert_one({
+        "exam_name": exam_name, "subject": subject, "difficulty": difficulty,
+        "num_questions": num_questions, "timer_minutes": timer_minutes,
+        "starts_at": starts_at, "join_until": starts_at + timedelta(minutes=join_window_minutes),
+        "languages": languages, "shuffle_questions": shuffle_questions, "shuffle_options": shuffle_options,
+        "status": "scheduled", "created_at": datetime.now()
+    }).inserted_id
+
+def prepare_schedule(schedule, generator=None, db=None):
+    """Generates the paper once, translates it into every configured language and stores it.
+
+    The schedule keeps only question references per language; the questions themselves go
+    to the shared content-hashed store. A translation is only used when every question was
+    translated; languages that still fail after TRANSLATION_ATTEMPTS are left out (and listed
+    in 'missing_languages'), so candidates choosing them see the English paper.
+    """
+    if db is None: db = get_db()
+    if db is None: return False
+    if generator is None:
+        from ai_generator import QuestionGenerator
+        generator = QuestionGenerator()
+    questions = generator.generate_questions(schedule['subject'], schedule['exam_name'], schedule['num_questions'], difficulty=schedule['difficulty'])
+    if not questions:
+        db.exam_schedules.update_one({"_id": schedule['_id']}, {"$set": {"status": "failed", "error": "AI returned no questions."}})
+        return False
+    originals = intern_questions(questions)
+    paper = {"English": store_questions(originals, db=db)}
+    missing = []
+    for language in schedule.get('languages', []):
+        # A partly English paper would be served to the whole cohort, so only complete translations count
+        for _ in range(TRANSLATION_ATTEMPTS):
+            translated = generator.translate_questions(originals, language, allow_partial=False)
+            if translated is not originals and len(translated) == len(originals):
+                paper[language] = store_questions(localize_questions(originals, translated, language), db=db)
+                break
+        else:
+            logger.warning(f"Translation into {language} failed for schedule {schedule['_id']}; serving English instead.")
+            missing.append(language)
+    db.exam_schedules.update_one({"_id": schedule['_id']}, {
+        "$set": {"status": "ready", "paper": paper, "missing_languages": missing, "prepared_at": datetime.now()},
+        "$unset": {"error": "", "lease_until": ""}
+    })
+    return True
+
+def prepare_due_schedules(within_minutes=PREPARE_AHEAD_MINUTES, generator=None):
+    """Prepares every schedule starting within `within_minutes`. Returns how many were prepared.
+
+    Each schedule is claimed with a lease before the LLM is called, so several workers (or a
+    cron job overlapping a slow run) never generate the same paper twice. A schedule that
+    fails is left for the next run rather than retried in this one.
+    """
+    db = get_db()
+    if db is None: return 0
+    prepared = 0
+    claimed = []
+    while True:
+        now = datetime.now()
+        schedule = db.exam_schedules.find_one_and_update(
+            {"_id": {"$nin": claimed}, "starts_at": {"$lte": now + timedelta(minutes=within_minutes)}, "join_until": {"$gt": now},
+             "$or": [{"status": {"$in": ["scheduled", "failed"]}}, {"status": "preparing", "lease_until": {"$lt": now}}]},
+            {"$set": {"status": "preparing", "lease_until": now + timedelta(minutes=PREPARE_LEASE_MINUTES)}},
+            sort=[("starts_at", 1)], return_document=ReturnDocument.AFTER
+        )
+        if schedule is None:
+            return prepared
+        claimed.append(schedule['_id'])
+        try:
+            prepared += prepare_schedule(schedule, generator=generator, db=db)
+        except Exception as e:
+            logger.error(f"Preparing schedule {schedule['_id']} failed: {e}", exc_info=True)
+            db.exam_schedules.update_one({"_id": schedule['_id']}, {"$set": {"status": "failed", "error": str(e)}})
+
+def get_open_schedules(now=None):
+    """Ready schedules a candidate can join now or soon, soonest first."""
+    db = get_db()
+    if db is None: return []
+    now = now or datetime.now()
+    return list(db.exam_schedules.find(
+        {"status": "ready", "join_until": {"$gt": now}, "starts_at": {"$lte": now + timedelta(minutes=PREPARE_AHEAD_MINUTES)}},
+        {"paper": 0}
+    ).sort("starts_at", 1))
+
+def _permute_options(question, order):
+    """Returns the question with its options shown in `order` (original letters) and the key remapped."""
+    return intern_question(permute_options(question.to_dict(), order))
+
+class CohortPaper:
+    """A prepared paper held in memory: interned originals plus one interned list per language."""
+
+    def __init__(self, schedule, papers):
+        self.schedule_id = str(schedule['_id'])
+        self.schedule = schedule
+        self.papers = papers
+        self.refs = schedule['paper']
+        self.languages = list(papers)
+        self.closes_at = schedule['join_until'] + timedelta(minutes=schedule['timer_minutes'])
+
+    def _layout(self, candidate):
+        """Question order and per-question option order for a candidate.
+
+        Seeded by schedule and candidate, so it is the same on every replica and after a resume.
+        """
+        seed = int(hashlib.sha256(f"{self.schedule_id}:{candidate}".encode()).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        order = list(range(len(self.papers["English"])))
+        if self.schedule.get('shuffle_questions'):
+            rng.shuffle(order)
+        option_orders = [rng.sample(OPTION_KEYS, len(OPTION_KEYS)) for _ in order] if self.schedule.get('shuffle_options') else None
+        return order, option_orders
+
+    def for_candidate(self, candidate, language):
+        """Returns (original_questions, exam_questions) as this candidate should see them.
+
+        Without option shuffling every candidate shares the cached objects.
+        """
+        originals = self.papers["English"]
+        shown = self.papers.get(language, originals)
+        order, option_orders = self._layout(candidate)
+        originals = [originals[i] for i in order]
+        shown = [shown[i] for i in order]
+        if option_orders:
+            originals = [_permute_options(q, o) for q, o in zip(originals, option_orders)]
+            if language != "English" and language in self.papers:
+                shown = localize_questions(originals, [_permute_options(q, o) for q, o in zip(shown, option_orders)], language)
+            else:
+                shown = originals
+        return originals, shown
+
+    def refs_for_candidate(self, candidate, language):
+        """Returns (original_refs, question_refs) matching for_candidate, pointing at the stored paper.
+
+        A shuffled question is not stored again: its reference carries the option order instead.
+        """
+        order, option_orders = self._layout(candidate)
+        def arrange(lang_refs):
+            refs = [dict(lang_refs[i]) for i in order]
+            for ref, options in zip(refs, option_orders or []):
+                ref['options'] = "".join(options)
+            return refs
+        return arrange(self.refs["English"]), arrange(self.refs.get(language, self.refs["English"]))
+
+def _load_paper(schedule_id, db):
+    schedule = db.exam_schedules.find_one({"_id": schedule_id, "status": "ready"})
+    if not schedule: return None
+    refs = schedule['paper']
+    stored = get_questions_by_hash([ref['hash'] for lang_refs in refs.values() for ref in lang_refs], db=db)
+    build = lambda lang_refs: [question_from_ref(stored, ref) for ref in lang_refs]
+    originals = intern_questions(build(refs["English"]))
+    papers = {"English": originals}
+    for language, lang_refs in refs.items():
+        if language != "English":
+            papers[language] = localize_questions(originals, build(lang_refs), language)
+    return CohortPaper(schedule, papers)
+
+class _PaperEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paper = None
+        self.checked_at = None
+
+_papers = {}
+_papers_lock = threading.Lock()
+
+def get_cohort_paper(schedule_id, db=None):
+    """Returns the prepared paper for a schedule, loading it at most once per process.
+
+    Concurrent joins for the same schedule wait on one loader (single flight) instead of each
+    reading the store; papers are dropped from the cache once their exam window has closed.
+    Returns None while the paper is not ready.
+    """
+    schedule_id = ObjectId(schedule_id) if isinstance(schedule_id, str) and ObjectId.is_valid(schedule_id) else schedule_id
+    with _papers_lock:
+        now = datetime.now()
+        for key in [k for k, e in _papers.items() if e.paper is not None and e.paper.closes_at < now]:
+            del _papers[key]
+        entry = _papers.setdefault(schedule_id, _PaperEntry())
+    with entry.lock:
+        if entry.paper is None and (entry.checked_at is None or time.monotonic() - entry.checked_at >= NOT_READY_RETRY_SECONDS):
+            if db is None: db = get_db()
+            if db is not None:
+                entry.paper = _load_paper(schedule_id, db)
+            entry.checked_at = time.monotonic()
+        return entry.paper
+
+def join_schedule(schedule, candidate, language, student_email="", db=None):
+    """Starts a candidate's attempt on a cohort exam and returns the exam state to save, or None while the paper is not ready.
+
+    The attempt references the paper already in the store, so a join costs one insert.
+    """
+    paper = get_cohort_paper(schedule['_id'], db=db)
+    if paper is None:
+        return None
+    original_questions, exam_questions = paper.for_candidate(candidate, language)
+    original_refs, question_refs = paper.refs_for_candidate(candidate, language)
+    exam_config = {
+        "subject": schedule['subject'], "exam_name": schedule['exam_name'], "num_questions": schedule['num_questions'],
+        "timer_minutes": schedule['timer_minutes'], "difficulty": schedule['difficulty'], "original_language": language,
+        "schedule_id": str(schedule['_id']), "exam_id": f"cohort_{schedule['_id']}"
+    }
+    # Everyone in the cohort shares the clock, so late joiners get less time
+    start_time = schedule['starts_at'].timestamp()
+    attempt_id = start_attempt({
+        "student_name": candidate,
+        "student_email": student_email,
+        "exam_id": exam_config['exam_id'],
+        "schedule_id": schedule['_id'],
+        "subject": schedule['subject'],
+        "config": exam_config,
+        "language": language,
+        "start_time": start_time,
+        "original_refs": original_refs,
+        "question_refs": question_refs
+    }, db=db)
+    return {
+        "exam_config": exam_config, "current_language": language,
+        "original_questions": original_questions, "exam_questions": exam_questions,
+        "student_responses": {}, "copy_warnings": 0, "current_q_index": 0,
+        "start_time": start_time, "attempt_id": attempt_id
+    }
@@ -1,19 +1,34 @@
 import os
-from pymongo import MongoClient
+import threading
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
+from bson import ObjectId
 from datetime import datetime
 import hashlib
+from question_model import QUESTION_FIELDS, question_hash, permute_options
 
 load_dotenv()
 
+DUPLICATE_KEY = 11000
+# Old submissions moved out of student_submissions by retention.archive_submissions
+ARCHIVE_COLLECTION = "student_submissions_archive"
+
+# One pooled, thread-safe client per process instead of a new connection pool per call
+_client = None
+_client_lock = threading.Lock()
+
 def get_db():
+    global _client
     try:
         uri = os.getenv("MONGO_URI")
         db_name = os.getenv("DB_NAME", "proctor_exam_db")
         if not uri:
             return None
-        client = MongoClient(uri)
-        return client[db_name]
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(uri)
+        return _client[db_name]
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
         return None
@@ -40,23 +55,253 @@ def authenticate_user(username, password):
     user = db.users.find_one({"username": username, "password": hashed_password})
     return user
 
-def submit_exam(submission):
-    db = get_db()
-    if db is None: return
-    submission['submission_time'] = datetime.now()
-    return db.student_submissions.insert_one(submission)
+def store_questions(questions, db=None):
+    """Stores questions once in the shared 'questions' collection and returns [{id, hash}] references."""
+    if db is None: db = get_db()
+    refs = []
+    ops = {}
+    for q in questions:
+        # Interned Questions already carry their hash
+        h = getattr(q, 'content_hash', None) or question_hash(q)
+        refs.append({"id": q.get('id'), "hash": h})
+        if h not in ops:
+            content = {key: q.get(key) for key in QUESTION_FIELDS}
+            content['created_at'] = datetime.now()
+            ops[h] = UpdateOne({"_id": h}, {"$setOnInsert": content}, upsert=True)
+    if db is not None and ops:
+        db.questions.bulk_write(list(ops.values()), ordered=False)
+    return refs
+
+def get_questions_by_hash(hashes, fields=None, db=None):
+    """Fetches stored questions with a single $in lookup, keyed by hash."""
+    if db is None: db = get_db()
+    if db is None or not hashes: return {}
+    projection = {key: 1 for key in fields} if fields else None
+    return {q.pop('_id'): q for q in db.questions.find({"_id": {"$in": list(set(hashes))}}, projection)}
+
+def question_from_ref(stored, ref):
+    """Rebuilds the question a reference points at; cohort refs may also carry the option order shown."""
+    question = dict(stored.get(ref['hash'], {}), id=ref['id'])
+    return permute_options(question, ref['options']) if ref.get('options') else question
+
+def hydrate_submissions(submissions, fields=None, db=None):
+    """Rebuilds 'questions_data' on submissions that only hold question references."""
+    hashes = [ref['hash'] for s in submissions if 'questions_data' not in s for ref in s.get('question_refs', [])]
+    stored = get_questions_by_hash(hashes, fields=fields, db=db)
+    for s in submissions:
+        if 'questions_data' in s or 'question_refs' not in s:
+            continue
+        s['questions_data'] = [question_from_ref(stored, ref) for ref in s['question_refs']]
+    return submissions
+
+def score_percentage(score, total_questions):
+    return round(score * 100 / total_questions) if total_questions else 0
+
+def score_stats_key(exam_id, subject, difficulty):
+    return f"{exam_id}|{subject}|{difficulty}"
 
-def get_submissions(student_name=None):
+def record_scores(db, submissions):
+    """Counts submissions in their (exam, subject, difficulty) histograms of 0-100% buckets."""
+    groups = {}
+    for sub in submissions:
+        key = score_stats_key(sub.get('exam_id'), sub.get('subject'), sub.get('difficulty'))
+        group = groups.setdefault(key, {"buckets": {}, "meta": {"exam_id": sub.get('exam_id'), "subject": sub.get('subject'), "difficulty": sub.get('difficulty')}})
+        bucket = f"buckets.{sub['percentage']}"
+        group["buckets"][bucket] = group["buckets"].get(bucket, 0) + 1
+    ops = [
+        UpdateOne({"_id": key}, {"$inc": dict(g["buckets"], count=sum(g["buckets"].values())), "$setOnInsert": g["meta"]}, upsert=True)
+        for key, g in groups.items()
+    ]
+    if ops:
+        db.score_stats.bulk_write(ops, ordered=False)
+
+def insert_submissions(submissions, db=None):
+    """Writes a batch of finished exams. Returns the indexes that should be retried, or None if the DB is unavailable.
+
+    Every submission carries its idempotency key as _id (the attempt id when there is one),
+    so a batch that is written twice, e.g. after a crash between insert and acknowledgement,
+    is stored once: duplicate-key errors are treated as success. A submission is added to its
+    score histogram until it is flagged 'counted', so a retry finishes an interrupted count. A
+    process that dies while holding a claim may leave those submissions uncounted, never counted
+    twice; backfill-score-stats repairs the histograms.
+    """
+    if db is None: db = get_db()
+    if db is None: return None
+    now = datetime.now()
+    for s in submissions:
+        s.setdefault('_id', ObjectId())
+    embedded = [s for s in submissions if 'questions_data' in s]
+    if embedded:
+        refs = iter(store_questions([q for s in embedded for q in s['questions_data'] + s.get('original_questions_data', [])], db=db))
+        for s in embedded:
+            s['question_refs'] = [next(refs) for _ in s.pop('questions_data')]
+            if 'original_questions_data' in s:
+                s['original_refs'] = [next(refs) for _ in s.pop('original_questions_data')]
+    for s in submissions:
+        s['percentage'] = score_percentage(s['score'], s['total_questions'])
+        s['ingested_at'] = now
+    failed = {}
+    try:
+        db.student_submissions.insert_many(submissions, ordered=False)
+    except BulkWriteError as e:
+        failed = {err['index']: err['code'] for err in e.details.get('writeErrors', [])}
+    # Count every stored submission not counted yet, duplicates included: an earlier try may have
+    # inserted them and then failed before the histogram update. Submissions are claimed with a
+    # token first, so with several drainers each one is counted by exactly one of them.
+    stored = [s for i, s in enumerate(submissions) if failed.get(i, DUPLICATE_KEY) == DUPLICATE_KEY]
+    ids = [s['_id'] for s in stored]
+    claim = ObjectId()
+    db.student_submissions.update_many({"_id": {"$in": ids}, "counted": {"$exists": False}}, {"$set": {"counted": claim}})
+    claimed = {"_id": {"$in": ids}, "counted": claim}
+    won = {doc['_id'] for doc in db.student_submissions.find(claimed, {"_id": 1})}
+    if won:
+        try:
+            record_scores(db, [s for s in stored if s['_id'] in won])
+        except Exception:
+            # Nothing was counted; release the claim so the retry counts them
+            db.student_submissions.update_many(claimed, {"$unset": {"counted": ""}})
+            raise
+        db.student_submissions.update_many(claimed, {"$set": {"counted": True}})
+    # Close the attempts behind these submissions (duplicates included, in case an earlier try stopped short)
+    closes = [
+        UpdateOne({"_id": s['attempt_id'], "status": "in_progress"}, {"$set": {
+            "status": "submitted", "responses": s.get('user_responses', {}), "updated_at": now,
+            **{key: s.get(key) for key in ("score", "total_questions", "percentage", "violation", "submission_time")}
+        }})
+        for i, s in enumerate(submissions) if s.get('attempt_id') and failed.get(i, DUPLICATE_KEY) == DUPLICATE_KEY
+    ]
+    if closes:
+        db.exam_attempts.bulk_write(closes, ordered=False)
+    return [i for i, code in failed.items() if code != DUPLICATE_KEY]
+
+def get_submissions(student_name=None, with_questions=False, question_fields=None, include_archived=False):
+    """Submissions newest first. Archived (cold) submissions are only read when `include_archived` is set."""
     db = get_db()
     if db is None: return []
     query = {}
     if student_name:
         query = {"student_name": student_name}
     submissions = list(db.student_submissions.find(query).sort("submission_time", -1))
+    if include_archived:
+        # Everything archived is older than anything still hot, so appending keeps the order
+        submissions += list(db[ARCHIVE_COLLECTION].find(query).sort("submission_time", -1))
     for s in submissions:
         s['id'] = str(s['_id'])
+    if with_questions:
+        hydrate_submissions(submissions, fields=question_fields, db=db)
     return submissions
 
+def start_attempt(attempt, db=None):
+    """Creates an in-progress exam attempt record and returns its id.
+
+    Pass 'original_questions' and 'exam_questions' to store the questions, or
+    'original_refs' and 'question_refs' when they are already stored (cohort papers).
+    """
+    if db is None: db = get_db()
+    if db is None: return None
+    now = datetime.now()
+    if 'original_questions' in attempt:
+        attempt['original_refs'] = store_questions(attempt.pop('original_questions'), db=db)
+        attempt['question_refs'] = store_questions(attempt.pop('exam_questions'), db=db)
+    attempt.update({"status": "in_progress", "responses": {}, "deltas": [], "started_at": now, "updated_at": now})
+    return db.exam_attempts.insert_one(attempt).inserted_id
+
+def update_attempt(attempt_id, fields):
+    db = get_db()
+    if db is None: return
+    if 'exam_questions' in fields:
+        fields['question_refs'] = store_questions(fields.pop('exam_questions'), db=db)
+    fields['updated_at'] = datetime.now()
+    return db.exam_attempts.update_one({"_id": attempt_id}, {"$set": fields})
+
+def _delta_update(deltas):
+    # Latest answer per question goes into 'responses'; the change itself is kept in a capped log
+    update = {"$set": {f"responses.{d['question_id']}": d['choice'] for d in deltas}}
+    update["$push"] = {"deltas": {"$each": deltas, "$slice": -500}}
+    return update
+
+def append_attempt_deltas(attempt_id, deltas):
+    """Applies a batch of coalesced answer changes to an attempt in one small update."""
+    db = get_db()
+    if db is None or not deltas: return
+    update = _delta_update(deltas)
+    update["$set"]["updated_at"] = datetime.now()
+    return db.exam_attempts.update_one({"_id": attempt_id, "status": "in_progress"}, update)
+
+def finalize_attempt(attempt_id, deltas, fields):
+    """Closes an attempt on submit, applying its last unflushed answer changes in the same update."""
+    db = get_db()
+    if db is None: return
+    update = _delta_update(deltas) if deltas else {"$set": {}}
+    update["$set"].update(fields, status="submitted", updated_at=datetime.now())
+    return db.exam_attempts.update_one({"_id": attempt_id, "status": "in_progress"}, update)
+
+def get_active_attempt(student_name, exclude=None):
+    """Returns the student's latest unfinished attempt with its questions rebuilt, or None.
+
+    Attempts for which `exclude(attempt_id)` is true are skipped, e.g. ones already submitted
+    whose submission is still waiting in the ingest queue to close them.
+    """
+    db = get_db()
+    if db is None: return None
+    cursor = db.exam_attempts.find({"student_name": student_name, "status": "in_progress"}, {"deltas": 0}).sort("started_at", -1)
+    attempt = next((a for a in cursor if not (exclude and exclude(a['_id']))), None)
+    if not attempt: return None
+    refs = attempt['original_refs'] + attempt['question_refs']
+    stored = get_questions_by_hash([ref['hash'] for ref in refs], db=db)
+    attempt['original_questions'] = [question_from_ref(stored, ref) for ref in attempt['original_refs']]
+    attempt['exam_questions'] = [question_from_ref(stored, ref) for ref in attempt['question_refs']]
+    return attempt
+
+def abandon_attempt(attempt_id):
+    db = get_db()
+    if db is None: return
+    return db.exam_attempts.update_one({"_id": attempt_id, "status": "in_progress"}, {"$set": {"status": "abandoned", "updated_at": datetime.now()}})
+
+def migrate_submission_questions(batch_size=500):
+    """Moves embedded 'questions_data' on old submissions into the shared question store."""
+    db = get_db()
+    if db is None: return 0
+    migrated = 0
+    cursor = db.student_submissions.find({"questions_data": {"$exists": True}}, {"questions_data": 1}).batch_size(batch_size)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            migrated += _migrate_batch(db, batch)
+            batch = []
+    if batch:
+        migrated += _migrate_batch(db, batch)
+    return migrated
+
+def _migrate_batch(db, batch):
+    # One upsert round-trip for every question in the batch, then one update round-trip for the submissions
+    all_questions = [q for doc in batch for q in doc['questions_data']]
+    refs = iter(store_questions(all_questions, db=db))
+    updates = []
+    for doc in batch:
+        doc_refs = [next(refs) for _ in doc['questions_data']]
+        updates.append(UpdateOne({"_id": doc['_id']}, {"$set": {"question_refs": doc_refs}, "$unset": {"questions_data": ""}}))
+    db.student_submissions.bulk_write(updates, ordered=False)
+    return len(updates)
+
+def ensure_indexes():
+    """Creates the indexes the maintenance jobs rely on. Safe to run repeatedly."""
+    db = get_db()
+    if db is None: return
+    db.student_submissions.create_index([("student_name", 1), ("submission_time", -1)])
+    db.student_submissions.create_index("question_refs.hash")
+    db.student_submissions.create_index("original_refs.hash")
+    db.student_submissions.create_index("submission_time")
+    db.student_submissions.create_index("ingested_at")
+    db.student_submissions.create_index([("exam_id", 1), ("subject", 1), ("difficulty", 1), ("percentage", -1), ("submission_time", 1)])
+    db.exam_attempts.create_index([("student_name", 1), ("status", 1), ("started_at", -1)])
+    db.proctoring_logs.create_index([("attempt_id", 1), ("timestamp", 1)])
+    db.proctoring_risk.create_index([("risk_score", -1)])
+    db.proctoring_risk.create_index([("exam_id", 1), ("risk_score", -1)])
+    db.proctoring_risk.create_index([("student_name", 1), ("first_event_at", 1)])
+    db.exam_schedules.create_index([("status", 1), ("starts_at", 1)])
+
 def log_proctoring_event(event):
     db = get_db()
     if db is None: return
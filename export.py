@@ -0,0 +1,183 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from bson import ObjectId
+from database import get_db, ARCHIVE_COLLECTION, get_questions_by_hash
+from question_model import OPTION_KEYS, remap_option
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; chunked CSV always works
+    pa = pq = None
+
+EXPORT_BATCH_SIZE = 2000
+ROWS_PER_CHUNK = 50_000
+# Documents newer than this are left for the next run, so late writers (clock skew between
+# replicas) still land after the watermark instead of being skipped
+SETTLE_SECONDS = 60
+WATERMARK_FILE = "_watermarks.json"
+
+ANSWER_COLUMNS = [
+    ("submission_id", "string"), ("attempt_id", "string"), ("student_name", "string"), ("exam_id", "string"),
+    ("subject", "string"), ("submission_time", "timestamp"), ("score", "int"), ("total_questions", "int"),
+    ("violation", "string"), ("question_index", "int"), ("question_id", "string"), ("question_hash", "string"),
+    ("response", "string"), ("correct_option", "string"), ("is_correct", "bool"),
+]
+EVENT_COLUMNS = [
+    ("event_id", "string"), ("attempt_id", "string"), ("student_name", "string"), ("event_type", "string"),
+    ("warning_number", "int"), ("timestamp", "timestamp"),
+]
+
+class ChunkedWriter:
+    """Buffers rows and writes them out every ROWS_PER_CHUNK, as one Parquet file or CSV parts."""
+
+    def __init__(self, out_dir, name, columns, fmt="parquet", chunk_rows=ROWS_PER_CHUNK):
+        if fmt == "parquet" and pq is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use --format csv instead.")
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.prefix = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.columns = columns
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.rows = []
+        self.rows_written = 0
+        self.files = []
+        self._parquet = None
+        if fmt == "parquet":
+            types = {"string": pa.string(), "int": pa.int64(), "bool": pa.bool_(), "timestamp": pa.timestamp("ms")}
+            self.schema = pa.schema([(col, types[kind]) for col, kind in columns])
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows: return
+        df = pd.DataFrame(self.rows, columns=[col for col, _ in self.columns])
+        if self.fmt == "parquet":
+            if self._parquet is None:
+                path = os.path.join(self.out_dir, f"{self.prefix}.parquet")
+                self._parquet = pq.ParquetWriter(path, self.schema)
+                self.files.append(path)
+            self._parquet.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        else:
+            path = os.path.join(self.out_dir, f"{self.prefix}_part{len(self.files):05d}.csv")
+            df.to_csv(path, index=False)
+            self.files.append(path)
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self._parquet is not None:
+            self._parquet.close()
+
+def _load_watermarks(out_dir):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    if not os.path.exists(path): return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_watermark(out_dir, key, value):
+    marks = _load_watermarks(out_dir)
+    marks[key] = value
+    with open(os.path.join(out_dir, WATERMARK_FILE), "w", encoding="utf-8") as f:
+        json.dump(marks, f, indent=2)
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _answer_rows(doc, keys):
+    """Yields one row per question of a submission, from question_refs or legacy questions_data."""
+    responses = doc.get("user_responses") or {}
+    base = {
+        "submission_id": str(doc["_id"]), "attempt_id": str(doc["attempt_id"]) if doc.get("attempt_id") else None,
+        "student_name": doc.get("student_name"), "exam_id": doc.get("exam_id"), "subject": doc.get("subject"),
+        "submission_time": doc.get("submission_time"), "score": doc.get("score"),
+        "total_questions": doc.get("total_questions"), "violation": doc.get("violation"),
+    }
+    if "question_refs" in doc:
+        questions = [(ref["id"], ref["hash"], remap_option(keys.get(ref["hash"]), ref.get("options") or OPTION_KEYS)) for ref in doc["question_refs"]]
+    else:
+        questions = [(q.get("id"), None, q.get("correct_option")) for q in doc.get("questions_data", [])]
+    for i, (q_id, q_hash, correct) in enumerate(questions):
+        response = responses.get(q_id)
+        yield dict(base, question_index=i, question_id=q_id, question_hash=q_hash, response=response,
+                   correct_option=correct, is_correct=response is not None and response == correct)
+
+def export_submissions(out_dir, fmt="parquet", incremental=False, batch_size=EXPORT_BATCH_SIZE, include_archived=False):
+    """Streams submissions into row-per-answer files, archived ones too with `include_archived`. Returns a report dict."""
+    db = get_db()
+    if db is None: return None
+    upper = datetime.now() - timedelta(seconds=SETTLE_SECONDS)
+    window = {"$lte": upper}
+    mark = _load_watermarks(out_dir).get("submissions") if incremental else None
+    if mark:
+        window["$gt"] = datetime.fromisoformat(mark)
+    # Queued submissions are stored after they were made, so the watermark follows ingested_at;
+    # submissions from before the ingest queue only have submission_time
+    query = {"$or": [{"ingested_at": window}, {"ingested_at": {"$exists": False}, "submission_time": window}]}
+
+    writer = ChunkedWriter(out_dir, "submissions", ANSWER_COLUMNS, fmt=fmt)
+    projection = {"questions_data.explanation": 0, "questions_data.question_text": 0}
+    # Everything archived is older than anything still hot, so reading it first keeps the order
+    collections = ([db[ARCHIVE_COLLECTION]] if include_archived else []) + [db.student_submissions]
+    start = time.perf_counter()
+    submissions = 0
+    for collection in collections:
+        cursor = collection.find(query, projection).sort("submission_time", 1).batch_size(batch_size)
+        for docs in _batches(cursor, batch_size):
+            # Answer keys for the whole batch in one $in lookup
+            hashes = [ref["hash"] for d in docs for ref in d.get("question_refs", [])]
+            keys = {h: q.get("correct_option") for h, q in get_questions_by_hash(hashes, fields=["correct_option"], db=db).items()}
+            for doc in docs:
+                for row in _answer_rows(doc, keys):
+                    writer.write(row)
+            submissions += len(docs)
+    writer.close()
+    _save_watermark(out_dir, "submissions", upper.isoformat())
+    return _report(writer, submissions, start)
+
+def export_proctoring_logs(out_dir, fmt="parquet", incremental=False, batch_size=EXPORT_BATCH_SIZE):
+    """Streams proctoring events into files, one row per event. Returns a report dict."""
+    db = get_db()
+    if db is None: return None
+    upper = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS))
+    query = {"_id": {"$lte": upper}}
+    mark = _load_watermarks(out_dir).get("proctoring_logs") if incremental else None
+    if mark:
+        query["_id"]["$gt"] = ObjectId(mark)
+
+    writer = ChunkedWriter(out_dir, "proctoring_logs", EVENT_COLUMNS, fmt=fmt)
+    cursor = db.proctoring_logs.find(query).sort("_id", 1).batch_size(batch_size)
+    start = time.perf_counter()
+    events = 0
+    for e in cursor:
+        writer.write({
+            "event_id": str(e["_id"]), "attempt_id": str(e["attempt_id"]) if e.get("attempt_id") else None,
+            "student_name": e.get("student_name"), "event_type": e.get("event_type"),
+            "warning_number": e.get("warning_number"), "timestamp": e.get("timestamp"),
+        })
+        events += 1
+    writer.close()
+    _save_watermark(out_dir, "proctoring_logs", str(upper))
+    return _report(writer, events, start)
+
+def _report(writer, documents, start):
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": documents, "rows": writer.rows_written, "files": writer.files,
+        "elapsed_seconds": elapsed, "rows_per_second": writer.rows_written / elapsed if elapsed else 0.0
+    }
@@ -0,0 +1,213 @@
+import logging
+import copy
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import streamlit as st
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+TAIL_INTERVAL_SECONDS = 2
+TAIL_BATCH_SIZE = 500
+LOOKBACK_HOURS = 12
+# Timestamp-tailed documents are read once they are this old: a batch shares one stamp and its
+# documents become visible one by one, not in _id order
+TAIL_SETTLE_SECONDS = 5
+MIN_OBJECT_ID = ObjectId("0" * 24)
+
+# Collection -> field used as the tailing cursor. Submissions reuse their attempt's _id (created
+# when the exam started) and reach MongoDB through the ingest queue some time after they were
+# made, so they are tailed by the time the drainer stored them instead.
+TAILED = {
+    "exam_attempts": "_id",
+    "proctoring_logs": "_id",
+    "student_submissions": "ingested_at",
+}
+
+def _new_candidate(name):
+    return {
+        "student_name": name, "exam_id": None, "subject": None, "attempt_id": None,
+        "status": "unknown", "tab_switches": 0, "copy_attempts": 0, "events": 0,
+        "last_event_type": None, "last_event_at": None, "score": None, "total_questions": None,
+        "violation": None, "started_at": None
+    }
+
+class EventTailer:
+    """Follows new attempts, proctoring events and submissions and keeps per-candidate totals.
+
+    One instance (and one background thread) per process serves every dashboard session.
+    Change streams are used when the deployment supports them; otherwise each collection is
+    polled from a monotonically increasing cursor, so a standalone server or an in-memory
+    stand-in works too. `poll_once` can be called directly to step the tailer deterministically.
+    """
+
+    def __init__(self, db=None, interval=TAIL_INTERVAL_SECONDS, batch_size=TAIL_BATCH_SIZE,
+                 lookback_hours=LOOKBACK_HOURS, use_change_streams=True):
+        self.db = db if db is not None else get_db()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.use_change_streams = use_change_streams
+        # ObjectIds embed UTC; the app writes naive local timestamps
+        lookback = timedelta(hours=lookback_hours)
+        self._cursors = {
+            name: ObjectId.from_datetime(datetime.now(timezone.utc) - lookback) if field == "_id" else datetime.now() - lookback
+            for name, field in TAILED.items()
+        }
+        # Cursors are (field, _id) pairs, so documents sharing a timestamp are paged through by _id
+        self._last_ids = {name: self._cursors[name] if field == "_id" else MIN_OBJECT_ID for name, field in TAILED.items()}
+        self._candidates = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.mode = "polling"
+        self.last_update = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="invigilator-tailer", daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(list(self._candidates.values())), self.last_update
+
+    def poll_once(self):
+        """Applies everything newer than the cursors. Returns the number of documents applied."""
+        applied = 0
+        for name, field in TAILED.items():
+            if field == "_id":
+                query = {"_id": {"$gt": self._cursors[name]}}
+            else:
+                query = {"$and": [
+                    {"$or": [{field: {"$gt": self._cursors[name]}}, {field: self._cursors[name], "_id": {"$gt": self._last_ids[name]}}]},
+                    {field: {"$lte": datetime.now() - timedelta(seconds=TAIL_SETTLE_SECONDS)}}
+                ]}
+            docs = self.db[name].find(query).sort([(field, 1), ("_id", 1)]).limit(self.batch_size)
+            applied += sum(self._consume(name, doc) for doc in docs)
+        return applied
+
+    def _consume(self, name, doc, from_stream=False):
+        """Applies a document once and moves the collection's cursor past it."""
+        field = TAILED[name]
+        value = doc.get(field)
+        if value is None:
+            return False
+        if (value, doc["_id"]) <= (self._cursors[name], self._last_ids[name]):
+            if not from_stream:
+                return False
+            # Streams deliver in commit order, which may trail another writer's _id/clock slightly
+            self._apply(name, doc)
+            return True
+        self._cursors[name], self._last_ids[name] = value, doc["_id"]
+        self._apply(name, doc)
+        self.last_update = datetime.now()
+        return True
+
+    def _apply(self, collection, doc):
+        name = doc.get("student_name")
+        if not name: return
+        with self._lock:
+            c = self._candidates.setdefault(name, _new_candidate(name))
+            if collection == "exam_attempts":
+                c.update({"attempt_id": doc["_id"], "exam_id": doc.get("exam_id"), "subject": doc.get("subject"),
+                          "status": "in progress", "started_at": doc.get("started_at"), "tab_switches": 0,
+                          "copy_attempts": 0, "events": 0, "score": None, "total_questions": None, "violation": None})
+            elif collection == "proctoring_logs":
+                if doc.get("attempt_id") not in (None, c["attempt_id"]):
+                    return  # event from an older attempt
+                c["events"] += 1
+                if doc.get("event_type") == "tab_switch": c["tab_switches"] += 1
+                elif doc.get("event_type") == "copy_attempt": c["copy_attempts"] += 1
+                c["last_event_type"] = doc.get("event_type")
+                c["last_event_at"] = doc.get("timestamp")
+            elif collection == "student_submissions":
+                c.update({"status": "submitted", "score": doc.get("score"), "total_questions": doc.get("total_questions"),
+                          "violation": doc.get("violation"), "exam_id": doc.get("exam_id") or c["exam_id"],
+                          "subject": doc.get("subject") or c["subject"]})
+
+    def _run(self):
+        if self.use_change_streams and self._watch():
+            return
+        self.mode = "polling"
+        while True:
+            try:
+                # Drain backlogs quickly, then wait for the next interval
+                while self.poll_once() >= self.batch_size:
+                    pass
+            except PyMongoError as e:
+                logger.error(f"Invigilator tailer poll failed: {e}", exc_info=True)
+            time.sleep(self.interval)
+
+    def _watch(self):
+        """Follows inserts with a change stream. Returns False when they are unsupported."""
+        pipeline = [{"$match": {"operationType": "insert", "ns.coll": {"$in": list(TAILED)}}}]
+        resume_token = None
+        try:
+            # Catch up on the lookback window first; the stream only delivers new inserts
+            self.poll_once()
+            while True:
+                with self.db.watch(pipeline, resume_after=resume_token) as stream:
+                    self.mode = "change stream"
+                    for change in stream:
+                        self._consume(change["ns"]["coll"], change["fullDocument"], from_stream=True)
+                        resume_token = stream.resume_token
+        except PyMongoError as e:
+            # Standalone servers (and most local stand-ins) reject $changeStream. Cursors were
+            # advanced as changes arrived, so polling picks up exactly where the stream stopped.
+            logger.warning(f"Change stream unavailable, falling back to polling: {e}")
+            return False
+
+_tailer = None
+_tailer_lock = threading.Lock()
+
+def get_tailer():
+    """Returns the process-wide tailer shared by all dashboard sessions, starting it on first use."""
+    global _tailer
+    with _tailer_lock:
+        if _tailer is None and get_db() is not None:
+            _tailer = EventTailer()
+            _tailer.start()
+    return _tailer
+
+def invigilator_view():
+    st.title("Invigilator Dashboard")
+    st.sidebar.write(f"Logged in as: **{st.session_state.username}** (invigilator)")
+    if st.sidebar.button("Logout", key="invigilator_logout"):
+        st.session_state.clear()
+        st.rerun()
+
+    tailer = get_tailer()
+    if tailer is None:
+        st.error("Database unavailable.")
+        return
+
+    @st.fragment(run_every=f"{TAIL_INTERVAL_SECONDS}s")
+    def live_table():
+        candidates, last_update = tailer.snapshot()
+        if not candidates:
+            st.info(f"No exam activity in the last {LOOKBACK_HOURS} hours.")
+            return
+        df = pd.DataFrame(candidates)
+        exams = sorted(e for e in df["exam_id"].dropna().unique())
+        selected = st.selectbox("Exam", ["All"] + exams, key="inv_exam")
+        if selected != "All":
+            df = df[df["exam_id"] == selected]
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Candidates", len(df))
+        m2.metric("In Progress", int((df["status"] == "in progress").sum()))
+        m3.metric("Submitted", int((df["status"] == "submitted").sum()))
+        m4.metric("Flagged", int((df["events"] > 0).sum()))
+
+        df = df.sort_values(["tab_switches", "copy_attempts", "events"], ascending=False)
+        st.dataframe(
+            df[["student_name", "exam_id", "status", "tab_switches", "copy_attempts", "last_event_type",
+                "last_event_at", "score", "total_questions", "violation"]],
+            use_container_width=True, hide_index=True
+        )
+        st.caption(f"Live via {tailer.mode}. Last update: {last_update or 'none yet'}")
+
+    live_table()
@@ -0,0 +1,83 @@
+import heapq
+from datetime import datetime
+from database import get_db, ARCHIVE_COLLECTION, score_stats_key
+
+def get_percentile(exam_id, subject, difficulty, percentage):
+    """Share of submissions (0-100) scoring below `percentage`, counting ties as half.
+
+    Reads a single score_stats histogram and walks its at most 101 buckets.
+    Returns (percentile, total_submissions), or (None, 0) when there is no data yet.
+    """
+    db = get_db()
+    if db is None: return None, 0
+    stats = db.score_stats.find_one({"_id": score_stats_key(exam_id, subject, difficulty)})
+    if not stats or not stats.get("count"):
+        return None, 0
+    below = equal = 0
+    for bucket, count in stats.get("buckets", {}).items():
+        if int(bucket) < percentage:
+            below += count
+        elif int(bucket) == percentage:
+            equal += count
+    return (below + equal / 2) * 100 / stats["count"], stats["count"]
+
+def get_leaderboard(exam_id, subject, difficulty, limit=10):
+    """Top `limit` students by their best percentage (earliest submission wins ties)."""
+    db = get_db()
+    if db is None: return []
+    query = {"exam_id": exam_id, "subject": subject, "difficulty": difficulty}
+    fields = {"student_name": 1, "score": 1, "total_questions": 1, "percentage": 1, "submission_time": 1}
+    sort = [("percentage", -1), ("submission_time", 1)]
+    # Archived submissions count towards percentiles, so they rank here too; both cursors are in rank order
+    cursors = [db[name].find(query, fields).sort(sort).batch_size(limit * 3) for name in ("student_submissions", ARCHIVE_COLLECTION)]
+    ranked = heapq.merge(*cursors, key=lambda s: (-s.get("percentage", -1), s.get("submission_time") or datetime.min))
+    # Walk the indexes in rank order and keep each student's first (best) entry
+    board, seen = [], set()
+    for sub in ranked:
+        if sub.get("student_name") in seen:
+            continue
+        seen.add(sub.get("student_name"))
+        board.append(sub)
+        if len(board) >= limit:
+            break
+    return board
+
+def backfill_score_stats():
+    """Rebuilds every histogram (and the stored percentage) from existing submissions, hot and archived.
+
+    Run it once after deploying, or whenever the histograms are suspected to have drifted;
+    histograms are replaced wholesale, so avoid running it while exams are being submitted.
+    Returns the number of histograms written.
+    """
+    db = get_db()
+    if db is None: return 0
+    for name in ("student_submissions", ARCHIVE_COLLECTION):
+        db[name].update_many(
+            {"percentage": {"$exists": False}, "total_questions": {"$gt": 0}},
+            [{"$set": {"percentage": {"$round": [{"$multiply": [{"$divide": ["$score", "$total_questions"]}, 100]}, 0]}}}]
+        )
+        # Everything is counted by the rebuild, so a queued retry must not add it again
+        db[name].update_many({"counted": {"$ne": True}}, {"$set": {"counted": True}})
+    db.student_submissions.aggregate([
+        {"$match": {"percentage": {"$exists": True}}},
+        {"$unionWith": {"coll": ARCHIVE_COLLECTION, "pipeline": [{"$match": {"percentage": {"$exists": True}}}]}},
+        {"$group": {
+            "_id": {"exam_id": "$exam_id", "subject": "$subject", "difficulty": {"$ifNull": ["$difficulty", None]}, "bucket": {"$toInt": "$percentage"}},
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": {"$concat": [
+                {"$ifNull": [{"$toString": "$_id.exam_id"}, "None"]}, "|",
+                {"$ifNull": [{"$toString": "$_id.subject"}, "None"]}, "|",
+                {"$ifNull": [{"$toString": "$_id.difficulty"}, "None"]}
+            ]},
+            "exam_id": {"$first": "$_id.exam_id"},
+            "subject": {"$first": "$_id.subject"},
+            "difficulty": {"$first": "$_id.difficulty"},
+            "count": {"$sum": "$count"},
+            "buckets": {"$push": {"k": {"$toString": "$_id.bucket"}, "v": "$count"}}
+        }},
+        {"$set": {"buckets": {"$arrayToObject": "$buckets"}}},
+        {"$merge": {"into": "score_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ])
+    return db.score_stats.count_documents({})
@@ -0,0 +1,204 @@
+"""Maintenance commands for the exam database.
+
+    python manage.py create-user NAME --role invigilator
+    python manage.py ensure-indexes
+    python manage.py migrate-questions [--batch-size 500]
+    python manage.py regrade corrections.json [--batch-size 5000] [--dry-run]
+    python manage.py refresh-risk
+    python manage.py risk-report [--exam-id ID] [--min-score 0] [--limit 50]
+    python manage.py export exports/ [--format parquet|csv] [--only submissions|proctoring] [--incremental] [--include-archived]
+    python manage.py backfill-score-stats
+    python manage.py schedule-exam "UPSC CSE" Polity --starts-at "2026-11-01 10:00" [--questions 20] [--timer 30] [--shuffle-options]
+    python manage.py prepare-exams [--within-minutes 60]
+    python manage.py retention [--log-ttl-days 30] [--archive-after-days 180] [--batch-size 1000] [--dry-run]
+    python manage.py storage-report
+"""
+import json
+import argparse
+import getpass
+from datetime import datetime
+from database import migrate_submission_questions, ensure_indexes, register_user
+from regrade import regrade_submissions
+from proctoring_risk import refresh_risk_summaries, get_risk_report
+from export import export_submissions, export_proctoring_logs
+from leaderboard import backfill_score_stats
+from cohort import create_schedule, prepare_due_schedules, PREPARE_AHEAD_MINUTES, JOIN_WINDOW_MINUTES
+from constants import DIFFICULTY_LEVELS, SUPPORTED_LANGUAGES
+from retention import ensure_retention, archive_submissions, storage_report, PROCTORING_LOG_TTL_DAYS, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+def cmd_create_user(args):
+    password = getpass.getpass(f"Password for {args.username}: ")
+    if register_user(args.username, password, role=args.role):
+        print(f"Created {args.role} '{args.username}'.")
+    else:
+        print("User already exists or database unavailable.")
+
+def cmd_ensure_indexes(args):
+    ensure_indexes()
+    print("Indexes are in place.")
+
+def cmd_migrate_questions(args):
+    migrated = migrate_submission_questions(batch_size=args.batch_size)
+    print(f"Migrated {migrated} submissions to question references.")
+
+def cmd_regrade(args):
+    # Accepts {"<question hash>": "B", ...} or [{"hash": ..., "correct_option": ...}, ...]
+    with open(args.corrections, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {item['hash']: item['correct_option'] for item in data}
+    ensure_indexes()
+    report = regrade_submissions(data, batch_size=args.batch_size, dry_run=args.dry_run)
+    if report is None:
+        print("Database unavailable.")
+        return
+    print(f"Matched {report['matched']:,} submissions, updated {report['updated']:,}, "
+          f"total score change {report['score_changes']:,}.")
+    if report.get('elapsed_seconds'):
+        print(f"Throughput: {report['submissions_per_second']:,.0f} submissions/s (audit {report['audit_id']})")
+
+def cmd_refresh_risk(args):
+    ensure_indexes()
+    refreshed = refresh_risk_summaries()
+    print(f"Refreshed risk summaries for {refreshed} attempts.")
+
+def cmd_risk_report(args):
+    rows = get_risk_report(exam_id=args.exam_id, min_score=args.min_score, limit=args.limit)
+    print(f"{'student':<20}{'exam':<30}{'risk':>6}{'tab':>5}{'copy':>6}{'near end':>10}{'prior':>7}")
+    for r in rows:
+        print(f"{r.get('student_name', ''):<20}{str(r.get('exam_id', '')):<30}{r.get('risk_score', 0):>6}"
+              f"{r.get('tab_switches', 0):>5}{r.get('copy_attempts', 0):>6}{r.get('near_end_events', 0):>10}"
+              f"{r.get('prior_flagged_attempts', 0):>7}")
+
+def cmd_export(args):
+    jobs = {"submissions": export_submissions, "proctoring": export_proctoring_logs}
+    for name, job in jobs.items():
+        if args.only and args.only != name:
+            continue
+        options = {"include_archived": args.include_archived} if name == "submissions" else {}
+        report = job(args.out_dir, fmt=args.format, incremental=args.incremental, batch_size=args.batch_size, **options)
+        if report is None:
+            print("Database unavailable.")
+            return
+        print(f"{name}: {report['documents']:,} documents -> {report['rows']:,} rows in {report['elapsed_seconds']:.1f}s "
+              f"({report['rows_per_second']:,.0f} rows/s), {len(report['files'])} file(s)")
+
+def cmd_backfill_score_stats(args):
+    ensure_indexes()
+    written = backfill_score_stats()
+    print(f"Rebuilt {written} score histograms.")
+
+def cmd_schedule_exam(args):
+    ensure_indexes()
+    schedule_id = create_schedule(
+        args.exam_name, args.subject, args.difficulty, args.questions, args.timer, datetime.fromisoformat(args.starts_at),
+        languages=args.languages, shuffle_questions=not args.no_shuffle_questions, shuffle_options=args.shuffle_options,
+        join_window_minutes=args.join_window
+    )
+    if schedule_id is None:
+        print("Database unavailable.")
+        return
+    print(f"Scheduled exam {schedule_id}. Run prepare-exams before it starts to generate the paper.")
+
+def cmd_prepare_exams(args):
+    prepared = prepare_due_schedules(within_minutes=args.within_minutes)
+    print(f"Prepared {prepared} exam paper(s).")
+
+def cmd_retention(args):
+    if not args.dry_run and not ensure_retention(log_ttl_days=args.log_ttl_days):
+        print("Database unavailable.")
+        return
+    report = archive_submissions(older_than_days=args.archive_after_days, batch_size=args.batch_size, dry_run=args.dry_run)
+    if report is None:
+        print("Database unavailable.")
+        return
+    if args.dry_run:
+        print(f"{report['eligible']:,} submissions from before {report['cutoff']:%Y-%m-%d} would be archived.")
+        return
+    print(f"Rolled-up proctoring events expire after {args.log_ttl_days} days.")
+    print(f"Archived {report['archived']:,} submissions from before {report['cutoff']:%Y-%m-%d} "
+          f"in {report['elapsed_seconds']:.1f}s ({report['submissions_per_second']:,.0f}/s).")
+    cmd_storage_report(args)
+
+def cmd_storage_report(args):
+    mib = lambda n: f"{n / 2**20:,.1f}"
+    print(f"{'collection':<30}{'tier':<6}{'documents':>12}{'data MiB':>12}{'disk MiB':>12}{'index MiB':>12}")
+    for r in storage_report():
+        print(f"{r['collection']:<30}{r['tier']:<6}{r['documents']:>12,}{mib(r['data_bytes']):>12}"
+              f"{mib(r['storage_bytes']):>12}{mib(r['index_bytes']):>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Exam system maintenance commands.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("create-user", help="Create a user, e.g. an invigilator account")
+    p.add_argument("username")
+    p.add_argument("--role", choices=["student", "invigilator"], default="student")
+    p.set_defaults(func=cmd_create_user)
+
+    p = sub.add_parser("ensure-indexes", help="Create the indexes used by the maintenance jobs")
+    p.set_defaults(func=cmd_ensure_indexes)
+
+    p = sub.add_parser("migrate-questions", help="Move embedded questions_data into the shared question store")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=cmd_migrate_questions)
+
+    p = sub.add_parser("regrade", help="Re-score submissions after correcting answer keys")
+    p.add_argument("corrections", help="JSON file mapping question hash to the corrected option")
+    p.add_argument("--batch-size", type=int, default=5000)
+    p.add_argument("--dry-run", action="store_true", help="Compute score changes without writing them")
+    p.set_defaults(func=cmd_regrade)
+
+    p = sub.add_parser("refresh-risk", help="Roll new proctoring events up into per-attempt risk summaries")
+    p.set_defaults(func=cmd_refresh_risk)
+
+    p = sub.add_parser("risk-report", help="List the highest-risk attempts")
+    p.add_argument("--exam-id")
+    p.add_argument("--min-score", type=int, default=0)
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(func=cmd_risk_report)
+
+    p = sub.add_parser("export", help="Stream submissions (row per answer) and proctoring events to Parquet/CSV")
+    p.add_argument("out_dir")
+    p.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    p.add_argument("--only", choices=["submissions", "proctoring"])
+    p.add_argument("--incremental", action="store_true", help="Only export what is newer than the last run's watermark")
+    p.add_argument("--batch-size", type=int, default=2000)
+    p.add_argument("--include-archived", action="store_true", help="Also export submissions moved to the archive")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("backfill-score-stats", help="Rebuild percentile histograms from existing submissions")
+    p.set_defaults(func=cmd_backfill_score_stats)
+
+    p = sub.add_parser("schedule-exam", help="Schedule a cohort exam that shares one pre-generated paper")
+    p.add_argument("exam_name")
+    p.add_argument("subject")
+    p.add_argument("--starts-at", required=True, help="Local start time, e.g. '2026-11-01 10:00'")
+    p.add_argument("--difficulty", choices=DIFFICULTY_LEVELS, default="Medium")
+    p.add_argument("--questions", type=int, default=20)
+    p.add_argument("--timer", type=int, default=30, help="Exam length in minutes")
+    p.add_argument("--languages", nargs="*", choices=SUPPORTED_LANGUAGES, help="Translations to prepare (default: all supported)")
+    p.add_argument("--join-window", type=int, default=JOIN_WINDOW_MINUTES, help="Minutes after the start that candidates may still join")
+    p.add_argument("--no-shuffle-questions", action="store_true", help="Show questions in the same order to everyone")
+    p.add_argument("--shuffle-options", action="store_true", help="Also shuffle the options of each question per candidate")
+    p.set_defaults(func=cmd_schedule_exam)
+
+    p = sub.add_parser("prepare-exams", help="Generate and translate papers for exams starting soon (run from cron)")
+    p.add_argument("--within-minutes", type=int, default=PREPARE_AHEAD_MINUTES)
+    p.set_defaults(func=cmd_prepare_exams)
+
+    p = sub.add_parser("retention", help="Expire rolled-up proctoring events and archive old submissions")
+    p.add_argument("--log-ttl-days", type=float, default=PROCTORING_LOG_TTL_DAYS)
+    p.add_argument("--archive-after-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    p.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    p.add_argument("--dry-run", action="store_true", help="Only count the submissions that would be archived")
+    p.set_defaults(func=cmd_retention)
+
+    p = sub.add_parser("storage-report", help="Show hot and cold collection sizes")
+    p.set_defaults(func=cmd_storage_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from database import log_proctoring_event
+from database import log_proctoring_event, update_attempt
+from session_store import update_exam_state
 
 def inject_proctoring_assets():
     """Injects CSS and JS for proctoring into the Streamlit app components."""
@@ -118,13 +119,17 @@ def inject_proctoring_assets():
 def render_proctoring_triggers(username, process_submission_callback):
     """Renders the invisible buttons that bridge JS events to Streamlit state."""
     if st.button("Trigger Tab Switch", key="proc_tab"):
-        log_proctoring_event({"student_name": username, "event_type": "tab_switch"})
+        log_proctoring_event({"student_name": username, "attempt_id": st.session_state.get("attempt_id"), "event_type": "tab_switch"})
         process_submission_callback(violation="Tab switch detected")
 
     if st.button("Trigger Copy Warning", key="proc_copy"):
-        st.session_state.copy_warnings = st.session_state.get('copy_warnings', 0) + 1
+        # Counted through the shared store so concurrent triggers on different replicas all register
+        update_exam_state(lambda state: {"copy_warnings": (state.get("copy_warnings") or 0) + 1})
+        if st.session_state.get("attempt_id") is not None:
+            update_attempt(st.session_state.attempt_id, {"copy_warnings": st.session_state.copy_warnings})
         log_proctoring_event({
             "student_name": username,
+            "attempt_id": st.session_state.get("attempt_id"),
             "event_type": "copy_attempt",
             "warning_number": st.session_state.copy_warnings
         })
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from database import get_db
+
+# Tuning for the risk score; every feature is a count, so the score is a weighted sum
+RISK_WEIGHTS = {
+    "tab_switch": 5,
+    "copy_attempt": 2,
+    "near_end": 2,       # any event in the last END_WINDOW_SECONDS of the attempt
+    "burst": 3,          # each event beyond the first in the busiest window
+    "prior_attempt": 4,  # each earlier attempt by the same student that also has events
+}
+WINDOW_SECONDS = 300
+END_WINDOW_SECONDS = 300
+JOB_ID = "proctoring_risk"
+# Events newer than this are left for the next run. An ObjectId is made before its insert
+# commits, so a slow insert (or another replica) can land behind an already-advanced watermark
+SETTLE_SECONDS = 60
+
+def _attempt_features_pipeline(attempt_ids):
+    """Recomputes per-attempt features for the given attempts and merges them into proctoring_risk."""
+    window_ms = WINDOW_SECONDS * 1000
+    end_ms = END_WINDOW_SECONDS * 1000
+    is_type = lambda t: {"$cond": [{"$eq": ["$event_type", t]}, 1, 0]}
+    return [
+        {"$match": {"attempt_id": {"$in": attempt_ids}}},
+        {"$setWindowFields": {
+            "partitionBy": "$attempt_id",
+            "sortBy": {"timestamp": 1},
+            "output": {"prev_timestamp": {"$shift": {"output": "$timestamp", "by": -1}}}
+        }},
+        {"$lookup": {
+            "from": "exam_attempts", "localField": "attempt_id", "foreignField": "_id", "as": "attempt",
+            "pipeline": [{"$project": {"exam_id": 1, "subject": 1, "started_at": 1, "submission_time": 1, "config.timer_minutes": 1}}]
+        }},
+        {"$set": {"attempt": {"$first": "$attempt"}}},
+        {"$set": {
+            "started_at": {"$ifNull": ["$attempt.started_at", "$timestamp"]},
+            "ends_at": {"$ifNull": [
+                "$attempt.submission_time",
+                {"$add": ["$attempt.started_at", {"$multiply": [{"$ifNull": ["$attempt.config.timer_minutes", 0]}, 60000]}]}
+            ]},
+            "gap_ms": {"$cond": [{"$ifNull": ["$prev_timestamp", False]}, {"$subtract": ["$timestamp", "$prev_timestamp"]}, None]}
+        }},
+        {"$set": {
+            "window": {"$floor": {"$divide": [{"$subtract": ["$timestamp", "$started_at"]}, window_ms]}},
+            "near_end": {"$cond": [
+                {"$and": [{"$ne": ["$ends_at", None]}, {"$gte": ["$timestamp", {"$subtract": ["$ends_at", end_ms]}]}]}, 1, 0
+            ]}
+        }},
+        {"$group": {
+            "_id": {"attempt_id": "$attempt_id", "window": "$window"},
+            "student_name": {"$first": "$student_name"},
+            "exam_id": {"$first": "$attempt.exam_id"},
+            "subject": {"$first": "$attempt.subject"},
+            "events": {"$sum": 1},
+            "tab_switches": {"$sum": is_type("tab_switch")},
+            "copy_attempts": {"$sum": is_type("copy_attempt")},
+            "near_end_events": {"$sum": "$near_end"},
+            "min_gap_ms": {"$min": "$gap_ms"},
+            "gap_total_ms": {"$sum": {"$ifNull": ["$gap_ms", 0]}},
+            "gap_count": {"$sum": {"$cond": [{"$ifNull": ["$gap_ms", False]}, 1, 0]}},
+            "first_event_at": {"$min": "$timestamp"},
+            "last_event_at": {"$max": "$timestamp"}
+        }},
+        {"$sort": {"_id.window": 1}},
+        {"$group": {
+            "_id": "$_id.attempt_id",
+            "student_name": {"$first": "$student_name"},
+            "exam_id": {"$first": "$exam_id"},
+            "subject": {"$first": "$subject"},
+            "total_events": {"$sum": "$events"},
+            "tab_switches": {"$sum": "$tab_switches"},
+            "copy_attempts": {"$sum": "$copy_attempts"},
+            "near_end_events": {"$sum": "$near_end_events"},
+            "max_events_per_window": {"$max": "$events"},
+            "events_per_window": {"$push": {"window": "$_id.window", "events": "$events"}},
+            "min_gap_ms": {"$min": "$min_gap_ms"},
+            "gap_total_ms": {"$sum": "$gap_total_ms"},
+            "gap_count": {"$sum": "$gap_count"},
+            "first_event_at": {"$min": "$first_event_at"},
+            "last_event_at": {"$max": "$last_event_at"}
+        }},
+        {"$set": {
+            "avg_gap_ms": {"$cond": [{"$gt": ["$gap_count", 0]}, {"$divide": ["$gap_total_ms", "$gap_count"]}, None]},
+            "base_risk_score": {"$add": [
+                {"$multiply": ["$tab_switches", RISK_WEIGHTS["tab_switch"]]},
+                {"$multiply": ["$copy_attempts", RISK_WEIGHTS["copy_attempt"]]},
+                {"$multiply": ["$near_end_events", RISK_WEIGHTS["near_end"]]},
+                {"$multiply": [{"$max": [{"$subtract": ["$max_events_per_window", 1]}, 0]}, RISK_WEIGHTS["burst"]]}
+            ]},
+            "window_seconds": WINDOW_SECONDS,
+            "updated_at": "$$NOW"
+        }},
+        {"$unset": ["gap_total_ms", "gap_count"]},
+        {"$merge": {"into": "proctoring_risk", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+def _repeat_offender_pipeline(student_names):
+    """Adds cross-attempt features for the given students and finalizes risk_score."""
+    return [
+        {"$match": {"student_name": {"$in": student_names}}},
+        {"$setWindowFields": {
+            "partitionBy": "$student_name",
+            "sortBy": {"first_event_at": 1},
+            "output": {
+                "prior_flagged_attempts": {"$count": {}, "window": {"documents": ["unbounded", -1]}},
+                "flagged_attempts_total": {"$count": {}, "window": {"documents": ["unbounded", "unbounded"]}}
+            }
+        }},
+        {"$project": {
+            "prior_flagged_attempts": 1,
+            "flagged_attempts_total": 1,
+            "risk_score": {"$add": ["$base_risk_score", {"$multiply": ["$prior_flagged_attempts", RISK_WEIGHTS["prior_attempt"]]}]}
+        }},
+        {"$merge": {"into": "proctoring_risk", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+def refresh_risk_summaries():
+    """Incrementally updates proctoring_risk from events logged since the previous run.
+
+    Only attempts with new events are recomputed (from all of their events, so results do not
+    depend on how runs are split), then the repeat-offender features of their students.
+    Events from the last SETTLE_SECONDS are left for the next run.
+    Returns the number of attempts refreshed.
+    """
+    db = get_db()
+    if db is None: return 0
+    state = db.job_state.find_one({"_id": JOB_ID}) or {}
+    settled = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS))
+    latest = db.proctoring_logs.find_one({"_id": {"$lte": settled}}, {"_id": 1}, sort=[("_id", -1)])
+    if not latest or latest['_id'] == state.get('last_event_id'):
+        return 0
+
+    # Fix the upper bound first (settled events only) so events arriving mid-run are picked up next time
+    id_range = {"$lte": latest['_id']}
+    if state.get('last_event_id'):
+        id_range["$gt"] = state['last_event_id']
+    attempt_ids = [a for a in db.proctoring_logs.distinct("attempt_id", {"_id": id_range}) if a is not None]
+
+    if attempt_ids:
+        db.proctoring_logs.aggregate(_attempt_features_pipeline(attempt_ids))
+        students = db.proctoring_risk.distinct("student_name", {"_id": {"$in": attempt_ids}})
+        db.proctoring_risk.aggregate(_repeat_offender_pipeline(students))
+        # Raw events of these attempts are now represented in the summary
+        db.proctoring_logs.update_many({"_id": id_range, "attempt_id": {"$in": attempt_ids}}, {"$set": {"rolled_up_at": datetime.now()}})
+
+    db.job_state.update_one({"_id": JOB_ID}, {"$set": {"last_event_id": latest['_id'], "updated_at": datetime.now()}}, upsert=True)
+    return len(attempt_ids)
+
+def get_risk_report(exam_id=None, min_score=0, limit=100):
+    """Highest-risk attempts first; served from the proctoring_risk summary by index."""
+    db = get_db()
+    if db is None: return []
+    query = {"risk_score": {"$gte": min_score}}
+    if exam_id:
+        query["exam_id"] = exam_id
+    return list(db.proctoring_risk.find(query).sort("risk_score", -1).limit(limit))
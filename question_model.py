@@ -0,0 +1,154 @@
+import json
+import hashlib
+import threading
+import weakref
+
+# Fields that make up a question's content. The per-exam 'id' is deliberately left out
+# so the same question reused across exams hashes to the same document.
+QUESTION_FIELDS = ['question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_option', 'explanation', 'appeared_in']
+
+OPTION_KEYS = ["A", "B", "C", "D"]
+
+def remap_option(option, order):
+    """Letter under which original option `option` is shown when options appear in `order`."""
+    order = list(order)
+    # Anything that is not one of the letters (e.g. a missing key) is passed through
+    return OPTION_KEYS[order.index(option)] if option in order else option
+
+def permute_options(data, order):
+    """Returns a copy of question dict `data` with its options shown in `order` (original letters) and the key remapped."""
+    data = dict(data)
+    originals = {key: data.get(f"option_{key.lower()}") for key in OPTION_KEYS}
+    for key, original in zip(OPTION_KEYS, order):
+        data[f"option_{key.lower()}"] = originals[original]
+    if 'correct_option' in data:
+        data['correct_option'] = remap_option(data['correct_option'], order)
+    return data
+
+def question_hash(question):
+    """Returns a stable content hash for a question dict."""
+    content = {key: question.get(key) for key in QUESTION_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+class Question:
+    """Immutable, interned question shared by every session that shows the same paper.
+
+    Behaves like the read-only dicts it replaces (q['option_a'], q.get(...), dict(q)),
+    so rendering and scoring code is unchanged. Translations are attached as
+    per-language overlays, which are themselves interned Questions. Overlays are shared
+    too: once a language is attached, every session holding the question can reuse it,
+    and it is never replaced.
+    """
+    __slots__ = ['id', 'content_hash', '_values', '_overlays', '__weakref__']
+
+    def __init__(self, data, content_hash=None):
+        set_attr = object.__setattr__
+        set_attr(self, 'id', data.get('id'))
+        set_attr(self, 'content_hash', content_hash or question_hash(data))
+        set_attr(self, '_values', tuple(data.get(key) for key in QUESTION_FIELDS))
+        set_attr(self, '_overlays', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Question is immutable")
+
+    def __getitem__(self, key):
+        if key == 'id':
+            return self.id
+        try:
+            value = self._values[_FIELD_INDEX[key]]
+        except KeyError:
+            raise KeyError(key) from None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return ['id'] + [key for key, value in zip(QUESTION_FIELDS, self._values) if value is not None]
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    # Shared and immutable, so copies (e.g. from the in-memory session store) are the object itself
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (intern_question, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"Question(id={self.id!r}, hash={self.content_hash[:12]})"
+
+    def localized(self, language):
+        """Returns the overlay for `language`, or this question when no translation is attached."""
+        return self._overlays.get(language, self)
+
+    def add_overlay(self, language, translated):
+        """Attaches `translated` unless a `language` overlay exists already; returns the one in use."""
+        with _overlay_lock:
+            return self._overlays.setdefault(language, translated)
+
+_FIELD_INDEX = {key: i for i, key in enumerate(QUESTION_FIELDS)}
+_overlay_lock = threading.Lock()
+
+# Process-wide intern table: a question stays cached only while some session still references it
+_interned = weakref.WeakValueDictionary()
+_intern_lock = threading.Lock()
+
+def intern_question(data):
+    """Returns the shared Question for this content and id, creating it on first use."""
+    if isinstance(data, Question):
+        return data
+    content_hash = question_hash(data)
+    key = (content_hash, data.get('id'))
+    with _intern_lock:
+        question = _interned.get(key)
+        if question is None:
+            question = Question(data, content_hash=content_hash)
+            _interned[key] = question
+    return question
+
+def intern_questions(questions):
+    return [intern_question(q) for q in questions]
+
+def localize_questions(originals, translated, language):
+    """Interns a translated paper and attaches it to the originals as a `language` overlay.
+
+    Returns this translation; when another session attached one first, the originals keep that one.
+    """
+    originals = intern_questions(originals)
+    if len(translated) != len(originals):
+        return intern_questions(translated)
+    # Translations keep the original's id so responses stay keyed the same way
+    translated = [intern_question(t if t.get('id') else dict(t, id=o.id)) for o, t in zip(originals, translated)]
+    for original, overlay in zip(originals, translated):
+        if overlay is not original:
+            original.add_overlay(language, overlay)
+    return translated
+
+def to_plain(value):
+    """Converts Questions (also inside lists/dicts) to plain dicts for JSON/BSON storage."""
+    if isinstance(value, Question):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    return value
@@ -0,0 +1,139 @@
+import time
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from pymongo import UpdateOne
+from database import get_db, ARCHIVE_COLLECTION, get_questions_by_hash, score_percentage, score_stats_key
+from question_model import remap_option
+
+def compute_score_deltas(row_index, responses, old_keys, new_keys, num_rows):
+    """Vectorized score change per submission.
+
+    The four arrays have one entry per (submission, corrected question) pair; row_index says
+    which submission the pair belongs to. A pair moves the score by +1 when the response
+    matches the new key, -1 when it matched the old key, and 0 otherwise.
+    """
+    delta = (responses == new_keys).astype(np.int64) - (responses == old_keys).astype(np.int64)
+    return np.bincount(row_index, weights=delta, minlength=num_rows).astype(np.int64)
+
+def _flatten_batch(docs, corrections, old_keys, linked=None):
+    """Turns a batch of submissions into the flat arrays compute_score_deltas expects.
+
+    Corrections name the English question, so they are matched through 'original_refs' when
+    the submission has them (a paper taken in another language references its translation in
+    'question_refs'). A correction naming the translated question itself also applies.
+    When `linked` is given, it collects shown hash -> corrected hash for those translations.
+    """
+    row_index, responses, old, new = [], [], [], []
+    for row, doc in enumerate(docs):
+        answers = doc.get('user_responses') or {}
+        refs = doc.get('original_refs')
+        shown = {ref['id']: ref['hash'] for ref in doc.get('question_refs', [])} if refs else {}
+        for ref in refs or doc.get('question_refs', []):
+            h = ref['hash'] if ref['hash'] in corrections else shown.get(ref['id'])
+            if h in corrections:
+                # Shuffled cohort papers show the options in their own order
+                order = ref.get('options')
+                row_index.append(row)
+                responses.append(answers.get(ref['id']) or '')
+                old.append(remap_option(old_keys[h], order) if order else old_keys[h])
+                new.append(remap_option(corrections[h], order) if order else corrections[h])
+                if linked is not None and shown.get(ref['id'], h) != h:
+                    linked[shown[ref['id']]] = h
+    return (np.array(row_index, dtype=np.int64), np.array(responses, dtype='<U1'),
+            np.array(old, dtype='<U1'), np.array(new, dtype='<U1'))
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def regrade_submissions(corrections, batch_size=5000, dry_run=False):
+    """Re-scores every submission that contains a question whose answer key was corrected.
+
+    `corrections` maps question hash -> corrected option (A-D). Submissions are streamed with a
+    projection, scored in vectorized batches and updated with bulk_write; the question store
+    is corrected last. Each run is recorded in 'regrade_audits', and submissions already
+    touched by that audit are skipped, so re-running an interrupted regrade is safe. Archived
+    submissions are re-scored too; avoid running it while retention is moving submissions.
+    Submissions still embedding questions_data must be migrated first (manage.py migrate-questions).
+    """
+    db = get_db()
+    if db is None: return None
+    corrections = {h: option.strip().upper() for h, option in corrections.items()}
+    stored = get_questions_by_hash(list(corrections), fields=['correct_option', 'original_correct_option'], db=db)
+    old_keys = {h: q['correct_option'] for h, q in stored.items()}
+    # Unknown hashes and no-op corrections are dropped rather than failing the whole run
+    corrections = {h: option for h, option in corrections.items() if h in old_keys and old_keys[h] != option}
+    if not corrections:
+        return {"matched": 0, "updated": 0, "score_changes": 0}
+
+    audit = {
+        "corrections": [{"hash": h, "old": old_keys[h], "new": option} for h, option in sorted(corrections.items())],
+        "status": "running", "dry_run": dry_run, "started_at": datetime.now()
+    }
+    existing = db.regrade_audits.find_one({"corrections": audit["corrections"], "status": "running", "dry_run": dry_run})
+    audit_id = existing['_id'] if existing else db.regrade_audits.insert_one(audit).inserted_id
+
+    start = time.perf_counter()
+    matched = updated = score_changes = 0
+    linked = {}
+    hashes = list(corrections)
+    # Archived submissions still count towards percentiles, so they are corrected as well
+    for collection in (db.student_submissions, db[ARCHIVE_COLLECTION]):
+        cursor = collection.find(
+            {"$or": [{"original_refs.hash": {"$in": hashes}}, {"question_refs.hash": {"$in": hashes}}], "regrades.audit_id": {"$ne": audit_id}},
+            {"original_refs": 1, "question_refs": 1, "user_responses": 1, "score": 1, "total_questions": 1, "percentage": 1,
+             "exam_id": 1, "subject": 1, "difficulty": 1}
+        ).batch_size(batch_size)
+
+        for docs in _batches(cursor, batch_size):
+            matched += len(docs)
+            deltas = compute_score_deltas(*_flatten_batch(docs, corrections, old_keys, linked), num_rows=len(docs))
+            score_changes += int(np.abs(deltas).sum())
+            if dry_run:
+                continue
+            now = datetime.now()
+            ops = []
+            bucket_moves = Counter()
+            for doc, delta in zip(docs, deltas):
+                update = {"$inc": {"score": int(delta)}, "$push": {"regrades": {"audit_id": audit_id, "delta": int(delta), "at": now}}}
+                if delta and doc.get('total_questions'):
+                    new_pct = score_percentage(doc.get('score', 0) + int(delta), doc['total_questions'])
+                    update["$set"] = {"percentage": new_pct}
+                    if 'percentage' in doc and new_pct != doc['percentage']:
+                        key = score_stats_key(doc.get('exam_id'), doc.get('subject'), doc.get('difficulty'))
+                        bucket_moves[(key, doc['percentage'])] -= 1
+                        bucket_moves[(key, new_pct)] += 1
+                ops.append(UpdateOne({"_id": doc['_id'], "regrades.audit_id": {"$ne": audit_id}}, update))
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            # Keep the percentile histograms in step with the corrected scores
+            stats_ops = [UpdateOne({"_id": key}, {"$inc": {f"buckets.{bucket}": n}}) for (key, bucket), n in bucket_moves.items() if n]
+            if stats_ops:
+                db.score_stats.bulk_write(stats_ops, ordered=False)
+
+    elapsed = time.perf_counter() - start
+    if not dry_run:
+        # Translations shown in place of a corrected question get the same key, so reviews agree with the score
+        targets = [(h, h) for h in corrections] + [(shown, h) for shown, h in linked.items() if shown not in corrections]
+        db.questions.bulk_write([
+            UpdateOne({"_id": target}, {"$set": {
+                "correct_option": corrections[h],
+                "original_correct_option": stored[h].get('original_correct_option', old_keys[h]),
+                "corrected_at": datetime.now()
+            }})
+            for target, h in targets
+        ], ordered=False)
+
+    report = {
+        "matched": matched, "updated": updated, "score_changes": score_changes,
+        "elapsed_seconds": elapsed, "submissions_per_second": matched / elapsed if elapsed else 0.0
+    }
+    db.regrade_audits.update_one({"_id": audit_id}, {"$set": dict(report, status="completed", finished_at=datetime.now())})
+    report["audit_id"] = audit_id
+    return report
@@ -0,0 +1,96 @@
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+from database import get_db, ARCHIVE_COLLECTION, DUPLICATE_KEY
+
+# Raw proctoring events are kept this long after refresh_risk_summaries has rolled them up
+PROCTORING_LOG_TTL_DAYS = 30
+ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_BATCH_SIZE = 1000
+INDEX_OPTIONS_CONFLICT = 85
+REPORTED_COLLECTIONS = ["student_submissions", ARCHIVE_COLLECTION, "proctoring_logs", "proctoring_risk", "exam_attempts", "questions"]
+
+def ensure_retention(log_ttl_days=PROCTORING_LOG_TTL_DAYS):
+    """Creates the TTL index on rolled-up proctoring events and the compressed archive collection.
+
+    Events only get 'rolled_up_at' once their attempt is summarised in proctoring_risk, so
+    nothing expires before it has been counted. Changing the TTL updates the existing index.
+    """
+    db = get_db()
+    if db is None: return False
+    ttl_seconds = int(log_ttl_days * 86400)
+    try:
+        db.proctoring_logs.create_index("rolled_up_at", expireAfterSeconds=ttl_seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        db.command("collMod", "proctoring_logs", index={"keyPattern": {"rolled_up_at": 1}, "expireAfterSeconds": ttl_seconds})
+    if ARCHIVE_COLLECTION not in db.list_collection_names():
+        try:
+            # Cold data is read rarely, so trade CPU for a much smaller footprint
+            db.create_collection(ARCHIVE_COLLECTION, storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}})
+        except CollectionInvalid:
+            pass
+    db[ARCHIVE_COLLECTION].create_index([("student_name", 1), ("submission_time", -1)])
+    db[ARCHIVE_COLLECTION].create_index("archived_at")
+    # Regrades and leaderboards read the archive as well
+    db[ARCHIVE_COLLECTION].create_index("question_refs.hash")
+    db[ARCHIVE_COLLECTION].create_index("original_refs.hash")
+    db[ARCHIVE_COLLECTION].create_index([("exam_id", 1), ("subject", 1), ("difficulty", 1), ("percentage", -1), ("submission_time", 1)])
+    return True
+
+def archive_submissions(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Moves submissions older than `older_than_days` into the archive collection, a batch at a time.
+
+    Each batch is copied before it is deleted, and copies are keyed by the original _id, so
+    an interrupted run loses nothing and a re-run only finishes the move.
+    Returns a report dict.
+    """
+    db = get_db()
+    if db is None: return None
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    query = {"submission_time": {"$lt": cutoff}}
+    if dry_run:
+        return {"archived": 0, "eligible": db.student_submissions.count_documents(query), "cutoff": cutoff}
+
+    start = time.perf_counter()
+    archived = 0
+    while True:
+        batch = list(db.student_submissions.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        now = datetime.now()
+        for doc in batch:
+            doc['archived_at'] = now
+        try:
+            db[ARCHIVE_COLLECTION].insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Already copied by an earlier, interrupted run
+            if any(err['code'] != DUPLICATE_KEY for err in e.details.get('writeErrors', [])):
+                raise
+        db.student_submissions.delete_many({"_id": {"$in": [doc['_id'] for doc in batch]}})
+        archived += len(batch)
+    elapsed = time.perf_counter() - start
+    return {"archived": archived, "cutoff": cutoff, "elapsed_seconds": elapsed,
+            "submissions_per_second": archived / elapsed if elapsed else 0.0}
+
+def storage_report():
+    """Documents, data size, on-disk size and index size per collection, hot and cold."""
+    db = get_db()
+    if db is None: return []
+    existing = set(db.list_collection_names())
+    rows = []
+    for name in REPORTED_COLLECTIONS:
+        if name not in existing:
+            continue
+        try:
+            stats = next(db[name].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+        except (OperationFailure, StopIteration) as e:
+            print(f"Storage stats unavailable for {name}: {e}")
+            continue
+        rows.append({
+            "collection": name, "tier": "cold" if name == ARCHIVE_COLLECTION else "hot",
+            "documents": stats.get("count", 0), "data_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0), "index_bytes": stats.get("totalIndexSize", 0)
+        })
+    return rows
@@ -0,0 +1,241 @@
+import os
+import copy
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import streamlit as st
+from bson import json_util
+from pymongo.errors import DuplicateKeyError
+from database import get_db
+from question_model import intern_questions, to_plain
+
+# Exam keys that live in the shared store instead of only in one process's st.session_state,
+# so any replica can pick the exam up (no sticky sessions needed).
+EXAM_STATE_KEYS = [
+    "exam_config", "exam_questions", "original_questions", "student_responses", "start_time",
+    "copy_warnings", "current_language", "current_q_index", "attempt_id",
+    "exam_completed", "last_score", "submission_reason"
+]
+# Query parameter holding the browser tab's exam session id
+SESSION_PARAM = "exam_session"
+
+class SessionConflict(Exception):
+    """Raised when a compare-and-swap update keeps losing to concurrent writers."""
+
+class BaseSessionStore:
+    """Versioned key -> state store. Every successful write bumps the version by one."""
+
+    def load(self, key):
+        """Returns (state, version); a missing key is ({}, 0)."""
+        raise NotImplementedError
+
+    def version(self, key):
+        """Returns the stored version alone (0 for a missing key), without reading the state."""
+        return self.load(key)[1]
+
+    def apply(self, key, changes, expected_version):
+        """Merges top-level `changes` if the stored version still equals `expected_version`.
+
+        Returns the new version, or None when another writer got there first.
+        """
+        raise NotImplementedError
+
+    def update(self, key, fn, retries=10):
+        """Read-modify-write with compare-and-swap: `fn(state)` returns the changes to merge."""
+        for _ in range(retries):
+            state, version = self.load(key)
+            changes = fn(state)
+            new_version = self.apply(key, changes, version)
+            if new_version is not None:
+                state.update(changes)
+                return state, new_version
+        raise SessionConflict(f"Could not update session '{key}' after {retries} attempts")
+
+class InMemorySessionStore(BaseSessionStore):
+    """Process-local store. The default; only suitable for a single Streamlit process."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            state, version = self._data.get(key, ({}, 0))
+            return copy.deepcopy(state), version
+
+    def version(self, key):
+        with self._lock:
+            return self._data.get(key, ({}, 0))[1]
+
+    def apply(self, key, changes, expected_version):
+        with self._lock:
+            state, version = self._data.get(key, ({}, 0))
+            if version != expected_version:
+                return None
+            state = dict(state)
+            state.update(copy.deepcopy(changes))
+            self._data[key] = (state, version + 1)
+            return version + 1
+
+class SQLiteSessionStore(BaseSessionStore):
+    """Shared-file store for several replicas on one host (or a shared volume).
+
+    Connections are pooled: opening one per call, and the WAL checkpoint when the last one
+    closes, cost more than the write itself. Writers in one process take turns on a lock so
+    only writers from other processes wait in SQLite's busy handler.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._idle = queue.SimpleQueue()
+        self._write_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS exam_sessions (key TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        # In WAL mode a commit survives a crash of the app; only power loss can drop the last few
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def load(self, key):
+        with self._connection() as conn:
+            row = conn.execute("SELECT state, version FROM exam_sessions WHERE key = ?", (key,)).fetchone()
+        if not row: return {}, 0
+        return json_util.loads(row[0]), row[1]
+
+    def version(self, key):
+        with self._connection() as conn:
+            row = conn.execute("SELECT version FROM exam_sessions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def apply(self, key, changes, expected_version):
+        payload = to_plain(changes)
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT state, version FROM exam_sessions WHERE key = ?", (key,)).fetchone()
+            state, version = (json_util.loads(row[0]), row[1]) if row else ({}, 0)
+            if version != expected_version:
+                conn.execute("ROLLBACK")
+                return None
+            state.update(payload)
+            conn.execute(
+                "INSERT OR REPLACE INTO exam_sessions (key, version, state, updated_at) VALUES (?, ?, ?, ?)",
+                (key, version + 1, json_util.dumps(state), time.time())
+            )
+            conn.execute("COMMIT")
+            return version + 1
+
+class MongoSessionStore(BaseSessionStore):
+    """Store backed by the exam_sessions collection, for replicas on different hosts."""
+
+    def __init__(self, db):
+        self.collection = db.exam_sessions
+
+    def load(self, key):
+        doc = self.collection.find_one({"_id": key})
+        if not doc: return {}, 0
+        doc.pop("_id")
+        version = doc.pop("_version")
+        doc.pop("_updated_at", None)
+        return doc, version
+
+    def version(self, key):
+        doc = self.collection.find_one({"_id": key}, {"_version": 1})
+        return doc["_version"] if doc else 0
+
+    def apply(self, key, changes, expected_version):
+        fields = dict(to_plain(changes), _updated_at=time.time())
+        if expected_version == 0:
+            try:
+                self.collection.insert_one(dict(fields, _id=key, _version=1))
+                return 1
+            except DuplicateKeyError:
+                return None
+        result = self.collection.update_one(
+            {"_id": key, "_version": expected_version},
+            {"$set": fields, "$inc": {"_version": 1}}
+        )
+        return expected_version + 1 if result.modified_count else None
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    """Returns the process-wide store selected by SESSION_BACKEND (memory, sqlite or mongo)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("SESSION_BACKEND", "memory").lower()
+            if backend == "sqlite":
+                _store = SQLiteSessionStore(os.getenv("SESSION_SQLITE_PATH", "exam_sessions.db"))
+            elif backend == "mongo" and get_db() is not None:
+                _store = MongoSessionStore(get_db())
+            else:
+                _store = InMemorySessionStore()
+    return _store
+
+def _session_key():
+    """One exam per user and browser tab.
+
+    The tab's id travels in the URL, so a reconnect to another replica finds the same exam,
+    while other tabs and devices of the same user get exams of their own.
+    """
+    tab = st.query_params.get(SESSION_PARAM)
+    if not tab:
+        tab = uuid.uuid4().hex
+        st.query_params[SESSION_PARAM] = tab
+    return f"{st.session_state.username}:{tab}"
+
+def _apply_to_session(state, version):
+    # Persistent backends hand back plain dicts; intern them so sessions share one copy
+    for key in ("original_questions", "exam_questions"):
+        if state.get(key):
+            state[key] = intern_questions(state[key])
+    # A None value means the key was cleared; versions only ever grow so replicas never miss it
+    for key in EXAM_STATE_KEYS:
+        if state.get(key) is not None:
+            st.session_state[key] = state[key]
+        elif key in st.session_state:
+            del st.session_state[key]
+    st.session_state._exam_state_version = version
+
+def sync_exam_state():
+    """Pulls the shared exam state into st.session_state when another replica has changed it.
+
+    Runs on every rerun, so only the version is read unless it has moved.
+    """
+    store, key = get_session_store(), _session_key()
+    if store.version(key) != st.session_state.get("_exam_state_version", 0):
+        _apply_to_session(*store.load(key))
+
+def update_exam_state(fn):
+    """Applies `fn(state) -> changes` with compare-and-swap and mirrors the result locally."""
+    state, version = get_session_store().update(_session_key(), fn)
+    _apply_to_session(state, version)
+    return state
+
+def save_exam_state(**changes):
+    return update_exam_state(lambda state: changes)
+
+def clear_exam_state():
+    return save_exam_state(**{key: None for key in EXAM_STATE_KEYS})
@@ -1,11 +1,22 @@
 import streamlit as st
 import time
+import threading
+import collections
+from datetime import datetime
 import pandas as pd
-from database import submit_exam, log_proctoring_event, register_user, authenticate_user, get_submissions
+from database import log_proctoring_event, register_user, authenticate_user, get_submissions, start_attempt, update_attempt, get_active_attempt, abandon_attempt, score_percentage
+from autosave import get_autosaver
+from submission_queue import get_submission_queue
+from leaderboard import get_percentile, get_leaderboard
+from cohort import get_open_schedules, get_cohort_paper, join_schedule
+from session_store import sync_exam_state, save_exam_state, update_exam_state, clear_exam_state
 from ai_generator import QuestionGenerator
 from constants import EXAM_SUBJECTS, SUPPORTED_LANGUAGES, DIFFICULTY_LEVELS
+from question_model import intern_questions, localize_questions
 from proctoring import inject_proctoring_assets, render_proctoring_triggers, reset_proctoring_ui
 
+REVIEW_PAGE_SIZE = 10
+
 def student_view():
     st.title("Student Portal - Online Exam")
 
@@ -28,14 +39,50 @@ def student_view():
         show_history()
         return
 
-    # 3. Exam State Flow
+    # 3. Exam State Flow (shared across replicas, so pick up changes made elsewhere first)
+    sync_exam_state()
     if st.session_state.get("exam_completed"):
         results_view(st.session_state.exam_questions)
     elif "exam_config" in st.session_state:
         exam_session_view(st.session_state.exam_questions, st.session_state.exam_config)
-    else:
+    elif not resume_attempt_view():
         exam_config_view()
 
+def resume_attempt_view():
+    """Offers to resume an unfinished attempt. Returns True while the prompt is shown."""
+    if "pending_attempt" not in st.session_state:
+        # A submitted attempt stays in progress until the drainer stores its submission; don't offer it again
+        st.session_state.pending_attempt = get_active_attempt(st.session_state.username, exclude=get_submission_queue().is_queued)
+    attempt = st.session_state.pending_attempt
+    if not attempt:
+        return False
+
+    config = attempt['config']
+    st.subheader("Unfinished Exam Found")
+    st.info(f"**{config['exam_name']} - {config['subject']}** ({len(attempt.get('responses', {}))}/{len(attempt['exam_questions'])} answered). The timer kept running while you were away.")
+    col1, col2 = st.columns(2)
+    if col1.button("▶️ Resume Exam", type="primary", use_container_width=True):
+        language = attempt.get('language', config['original_language'])
+        original_questions = intern_questions(attempt['original_questions'])
+        save_exam_state(
+            exam_config=config,
+            current_language=language,
+            original_questions=original_questions,
+            exam_questions=localize_questions(original_questions, attempt['exam_questions'], language) if language != "English" else original_questions,
+            student_responses=dict(attempt.get('responses', {})),
+            copy_warnings=attempt.get('copy_warnings', 0),
+            start_time=attempt['start_time'],
+            current_q_index=0,
+            attempt_id=attempt['_id']
+        )
+        del st.session_state.pending_attempt
+        st.rerun()
+    if col2.button("🗑️ Discard & Start New", use_container_width=True):
+        abandon_attempt(attempt['_id'])
+        st.session_state.pending_attempt = None
+        st.rerun()
+    return True
+
 def auth_view():
     """Handles user login and registration."""
     tab1, tab2 = st.tabs(["Login", "Register"])
@@ -51,6 +98,7 @@ def auth_view():
                     st.session_state.username = username
                     st.session_state.student_name = username
                     st.session_state.student_email = ""
+                    st.session_state.role = user.get("role", "student")
                     st.success(f"Logged in as {username}")
                     st.rerun()
                 else:
@@ -73,8 +121,45 @@ def auth_view():
                     else:
                         st.error("Username already exists")
 
+@st.cache_data(ttl=15, show_spinner=False)
+def _open_schedules():
+    # Shared by every session, so a cohort refreshing the page costs one query per 15s
+    return get_open_schedules()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _leaderboard(exam_id, subject, difficulty):
+    # Everyone on the same exam sees the same board, so reruns and sessions share one query per 30s
+    return get_leaderboard(exam_id, subject, difficulty)
+
+def scheduled_exams_view():
+    """Lists cohort exams whose paper is ready and lets the candidate join one."""
+    schedules = _open_schedules()
+    if not schedules:
+        return
+    st.subheader("Scheduled Exams")
+    language = st.selectbox("Preferred Language", SUPPORTED_LANGUAGES, key="cohort_lang")
+    now = datetime.now()
+    for schedule in schedules:
+        with st.container(border=True):
+            c1, c2 = st.columns([3, 1])
+            c1.markdown(f"**{schedule['exam_name']} - {schedule['subject']}** ({schedule['difficulty']})  \n"
+                        f"{schedule['num_questions']} questions, {schedule['timer_minutes']} min. Starts {schedule['starts_at']:%d %b %H:%M}")
+            started = schedule['starts_at'] <= now
+            if c2.button("Join" if started else "Not started", key=f"join_{schedule['_id']}", disabled=not started, use_container_width=True):
+                join_scheduled_exam(schedule, language)
+    st.divider()
+
+def join_scheduled_exam(schedule, language):
+    state = join_schedule(schedule, st.session_state.username, language, st.session_state.get("student_email", ""))
+    if state is None:
+        st.error("The paper for this exam is not available yet. Please try again shortly.")
+        return
+    save_exam_state(**state)
+    st.rerun()
+
 def exam_config_view():
     """Handles the exam setup and question generation."""
+    scheduled_exams_view()
     st.subheader("Configure Your Exam")
     
     all_exams = sorted(list(EXAM_SUBJECTS.keys())) + ["Other (Type below)"]
@@ -98,24 +183,44 @@ def exam_config_view():
                 with st.spinner("Generating PYQs using AI..."):
                     try:
                         generator = QuestionGenerator()
-                        previous_submissions = get_submissions(st.session_state.username)
+                        previous_submissions = get_submissions(st.session_state.username, with_questions=True, question_fields=['question_text'])
                         # Avoid recently generated questions from ALL subjects to ensure maximum diversity across sessions
-                        avoid_texts = [q['question_text'] for sub in previous_submissions for q in sub.get('questions_data', [])]
+                        avoid_texts = [q['question_text'] for sub in previous_submissions for q in sub.get('questions_data', []) if q.get('question_text')]
                         
                         # Note: QuestionGenerator.generate_questions will handle truncating this to the last 100
                         questions = generator.generate_questions(subject, exam_name, int(num_questions), difficulty=difficulty, avoid_questions=avoid_texts)
                         if questions:
-                            st.session_state.exam_config = {"subject": subject, "exam_name": exam_name, "num_questions": num_questions, "timer_minutes": timer_minutes, "difficulty": difficulty, "original_language": language}
-                            st.session_state.current_language = language
-                            st.session_state.original_questions = questions
-                            st.session_state.current_q_index = 0
+                            questions = intern_questions(questions)
+                            exam_config = {"subject": subject, "exam_name": exam_name, "num_questions": num_questions, "timer_minutes": timer_minutes, "difficulty": difficulty, "original_language": language}
                             
                             if language != "English":
-                                st.session_state.exam_questions = generator.translate_questions(questions, language)
+                                exam_questions = localize_questions(questions, generator.translate_questions(questions, language), language)
                             else:
-                                st.session_state.exam_questions = questions
+                                exam_questions = questions
 
-                            st.session_state.start_time = time.time()
+                            start_time = time.time()
+                            attempt_id = start_attempt({
+                                "student_name": st.session_state.username,
+                                "student_email": st.session_state.get("student_email", ""),
+                                "exam_id": "ai_generated_" + exam_name,
+                                "subject": subject,
+                                "config": exam_config,
+                                "language": language,
+                                "start_time": start_time,
+                                "original_questions": questions,
+                                "exam_questions": exam_questions
+                            })
+                            save_exam_state(
+                                exam_config=exam_config,
+                                current_language=language,
+                                original_questions=questions,
+                                exam_questions=exam_questions,
+                                student_responses={},
+                                copy_warnings=0,
+                                current_q_index=0,
+                                start_time=start_time,
+                                attempt_id=attempt_id
+                            )
                             st.rerun()
                         else:
                             st.error("⚠️ AI returned no questions.")
@@ -128,22 +233,44 @@ def exam_session_view(questions, config):
     
     def process_submission(violation=None):
         responses = st.session_state.get("student_responses", {})
+        # Answer-key corrections are made against the English paper, so keep its refs too
+        originals = st.session_state.get("original_questions") or questions
         score = sum(1 for q in questions if responses.get(q['id']) == q['correct_option'])
         submission_data = {
             "student_name": st.session_state.username,
             "student_email": st.session_state.get("student_email", ""),
-            "exam_id": "ai_generated_" + config['exam_name'],
+            "exam_id": config.get('exam_id', "ai_generated_" + config['exam_name']),
             "score": score,
             "total_questions": len(questions),
             "subject": config['subject'],
-            "questions_data": questions,
+            "difficulty": config.get('difficulty'),
             "user_responses": responses,
-            "violation": violation
+            "violation": violation,
+            "submission_time": datetime.now()
         }
-        if violation: st.session_state.submission_reason = violation
-        submit_exam(submission_data)
-        st.session_state.last_score = score
-        st.session_state.exam_completed = True
+        attempt_id = st.session_state.get("attempt_id")
+        if attempt_id is not None:
+            submission_data.update(_id=attempt_id, attempt_id=attempt_id)
+            # Close the attempt now, with its unflushed answers, so it is never offered for resuming again
+            get_autosaver().finalize(attempt_id, {
+                "score": score, "total_questions": len(questions), "percentage": score_percentage(score, len(questions)),
+                "violation": violation, "submission_time": submission_data["submission_time"]
+            })
+        paper = get_cohort_paper(config['schedule_id']) if config.get('schedule_id') else None
+        if paper is not None:
+            # Cohort questions are already stored once for everyone; shuffled options travel in the refs
+            original_refs, question_refs = paper.refs_for_candidate(st.session_state.username, st.session_state.current_language)
+            submission_data.update(question_refs=question_refs, original_refs=original_refs)
+        elif attempt_id is not None and not config.get('schedule_id'):
+            # The attempt already stored these questions
+            submission_data.update(question_refs=[{"id": q['id'], "hash": q.content_hash} for q in questions],
+                                   original_refs=[{"id": q['id'], "hash": q.content_hash} for q in originals])
+        else:
+            submission_data["questions_data"] = questions
+            submission_data["original_questions_data"] = originals
+        # Acknowledged once it is in the local queue; the drainer writes it to MongoDB in batches
+        get_submission_queue().enqueue(submission_data)
+        save_exam_state(last_score=score, exam_completed=True, submission_reason=violation)
         reset_proctoring_ui()
         st.rerun()
 
@@ -154,8 +281,25 @@ def exam_session_view(questions, config):
     with col2:
         selected_lang = st.selectbox("Language", SUPPORTED_LANGUAGES, index=SUPPORTED_LANGUAGES.index(st.session_state.current_language))
         if selected_lang != st.session_state.current_language:
-            st.session_state.exam_questions = QuestionGenerator().translate_questions(st.session_state.original_questions, selected_lang) if selected_lang != "English" else st.session_state.original_questions
-            st.session_state.current_language = selected_lang
+            originals = st.session_state.original_questions
+            paper = get_cohort_paper(config['schedule_id']) if config.get('schedule_id') else None
+            if selected_lang == "English":
+                translated = originals
+            elif paper is not None and selected_lang in paper.languages:
+                # Cohort papers were translated ahead of time
+                translated = paper.for_candidate(st.session_state.username, selected_lang)[1]
+            elif all(q.localized(selected_lang) is not q for q in originals):
+                # Another session already translated this paper; reuse the shared overlay
+                translated = [q.localized(selected_lang) for q in originals]
+            else:
+                translated = localize_questions(originals, QuestionGenerator().translate_questions(originals, selected_lang), selected_lang)
+            save_exam_state(exam_questions=translated, current_language=selected_lang)
+            if st.session_state.get("attempt_id") is not None:
+                if paper is not None and selected_lang in paper.languages:
+                    fields = {"question_refs": paper.refs_for_candidate(st.session_state.username, selected_lang)[1]}
+                else:
+                    fields = {"exam_questions": st.session_state.exam_questions}
+                update_attempt(st.session_state.attempt_id, dict(fields, language=selected_lang))
             st.rerun()
 
     @st.fragment(run_every="1s")
@@ -168,6 +312,11 @@ def exam_session_view(questions, config):
 
     main_timer()
 
+    def jump_to_question():
+        if st.session_state.palette is not None:
+            save_exam_state(current_q_index=st.session_state.palette)
+            st.session_state.palette_jumped = True
+
     @st.fragment
     def question_palette():
         responses = st.session_state.get("student_responses", {})
@@ -179,15 +328,15 @@ def exam_session_view(questions, config):
         m2.metric("Attempted", len(responses))
         m3.metric("Remaining", total - len(responses))
 
-        cols = st.columns(10)
-        for i in range(total):
-            label = f"{i+1}"
-            if i == curr: label = f"📍 {label}"
-            elif questions[i]['id'] in responses: label = f"✅ {label}"
-            
-            if cols[i % 10].button(label, key=f"pal_{i}", use_container_width=True, type="primary" if i == curr else "secondary"):
-                st.session_state.current_q_index = i
-                st.rerun()
+        if st.session_state.pop("palette_jumped", False):
+            st.rerun()  # the question pane lives in another fragment
+        # One keyed element instead of a grid of buttons: only the labels that changed are redrawn
+        if st.session_state.get("palette") != curr:
+            st.session_state.palette = curr
+        st.pills(
+            "Questions", range(total), key="palette", label_visibility="collapsed", on_change=jump_to_question,
+            format_func=lambda i: f"📍 {i+1}" if i == curr else f"✅ {i+1}" if questions[i]['id'] in responses else f"{i+1}"
+        )
 
     question_palette()
     st.divider()
@@ -216,15 +365,18 @@ def exam_session_view(questions, config):
             with st.container(border=True):
                 st.markdown(f"**Q{idx+1}:**  \n{q['question_text']}")
                 choice = st.radio("Options", ["A", "B", "C", "D"], key=f"q_{q['id']}", index=None if q['id'] not in responses else ["A", "B", "C", "D"].index(responses[q['id']]), format_func=lambda x: f"{x}) {q[f'option_{x.lower()}']}")
-                if choice: responses[q['id']] = choice
-                st.session_state.student_responses = responses
+                if choice and responses.get(q['id']) != choice:
+                    # Merge against the stored map so an answer given on another replica is not lost
+                    update_exam_state(lambda state: {"student_responses": {**(state.get("student_responses") or {}), q['id']: choice}})
+                    if st.session_state.get("attempt_id") is not None:
+                        get_autosaver().record(st.session_state.attempt_id, q['id'], choice)
 
             c1, c2, c3 = st.columns(3)
             if c1.button("⬅️ Previous", disabled=(idx == 0)):
-                st.session_state.current_q_index -= 1
+                save_exam_state(current_q_index=idx - 1)
                 st.rerun()
             if c2.button("Next ➡️") if idx < len(questions) - 1 else False:
-                st.session_state.current_q_index += 1
+                save_exam_state(current_q_index=idx + 1)
                 st.rerun()
             if c3.button("🚀 Submit", type="primary") if idx == len(questions) - 1 else False:
                 st.session_state.show_submit_confirm = True
@@ -248,46 +400,95 @@ def results_view(questions):
     col1.metric("Final Score", f"{score} / {total}")
     col2.metric("Accuracy", f"{percentage:.1f}%")
     col3.metric("Status", "Pass" if percentage >= 40 else "Needs Improvement")
+
+    config = st.session_state.get("exam_config", {})
+    cohort = (config.get('exam_id', "ai_generated_" + config.get('exam_name', '')), config.get('subject'), config.get('difficulty'))
+    # One histogram read per result page, not per rerun
+    if "percentile_rank" not in st.session_state:
+        st.session_state.percentile_rank = get_percentile(*cohort, score_percentage(score, total))
+    rank, cohort_size = st.session_state.percentile_rank
+    if rank is not None:
+        st.caption(f"📊 You scored better than {rank:.0f}% of {cohort_size} submissions for this exam.")
+    with st.expander("🏆 Leaderboard"):
+        board = _leaderboard(*cohort)
+        if board:
+            st.dataframe(pd.DataFrame([
+                {"Rank": i + 1, "Student": b.get('student_name'), "Score": f"{b.get('score')}/{b.get('total_questions')}", "Percentage": b.get('percentage')}
+                for i, b in enumerate(board)
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.write("No submissions yet.")
     
     st.divider()
     st.subheader("📋 Detailed Performance Review")
-    
-    res = st.session_state.get("student_responses", {})
-    for i, q in enumerate(questions):
-        chosen = res.get(q['id'])
-        correct = q['correct_option']
-        
-        with st.container(border=True):
-            st.markdown(f"**Question {i+1}:**  \n{q['question_text']}")
-            if q.get('appeared_in'):
-                st.caption(f"Source: {q['appeared_in']}")
-            
-            options = {"A": q['option_a'], "B": q['option_b'], "C": q['option_c'], "D": q['option_d']}
-            for key, val in options.items():
-                label = f"({key}) {val}"
-                if key == correct:
-                    st.write(f"✅ **{label} (Correct Answer)**")
-                elif key == chosen:
-                    st.write(f"❌ ~~{label} (Your Choice)~~")
-                else:
-                    st.write(f"&nbsp;&nbsp;&nbsp;&nbsp;{label}")
-            
-            st.info(f"**Explanation:**\n\n{q.get('explanation', 'No explanation available.')}")
+    review_page(questions, st.session_state.get("student_responses", {}), st.session_state.get("current_language", "English"))
     
     col1, col2 = st.columns(2)
     if col1.button("📑 Take New Test", key="new_test_btn"):
-        keys_to_keep = ["username", "student_name", "student_email"]
+        clear_exam_state()
+        keys_to_keep = ["username", "student_name", "student_email", "_exam_state_version"]
         for key in list(st.session_state.keys()):
             if key not in keys_to_keep:
                 del st.session_state[key]
         st.rerun()
         
     if col2.button("🚪 Logout", key="logout_btn_res"):
+        clear_exam_state()
         st.session_state.clear()
         st.rerun()
 
+REVIEW_CACHE_SIZE = 4096
+# Rendered review blocks keyed by (question hash, language, chosen option). Only strings are
+# kept, so cached entries never keep an interned Question alive.
+_review_cache = collections.OrderedDict()
+_review_cache_lock = threading.Lock()
+
+def _review_markdown(question, chosen, language):
+    """Question text, source and marked options as one markdown block (without the number)."""
+    key = (question.content_hash, language, chosen)
+    with _review_cache_lock:
+        if key in _review_cache:
+            _review_cache.move_to_end(key)
+            return _review_cache[key]
+    lines = [question['question_text']]
+    if question.get('appeared_in'):
+        lines.append(f"*Source: {question['appeared_in']}*")
+    options = []
+    for key_option in ["A", "B", "C", "D"]:
+        label = f"({key_option}) {question[f'option_{key_option.lower()}']}"
+        if key_option == question['correct_option']:
+            options.append(f"✅ **{label} (Correct Answer)**")
+        elif key_option == chosen:
+            options.append(f"❌ ~~{label} (Your Choice)~~")
+        else:
+            options.append(f"&nbsp;&nbsp;&nbsp;&nbsp;{label}")
+    lines.append("  \n".join(options))
+    text = "\n\n".join(lines)
+    with _review_cache_lock:
+        _review_cache[key] = text
+        if len(_review_cache) > REVIEW_CACHE_SIZE:
+            _review_cache.popitem(last=False)
+    return text
+
+@st.fragment
+def review_page(questions, responses, language="English"):
+    """Reviews REVIEW_PAGE_SIZE questions at a time; turning the page only reruns this fragment."""
+    pages = max(1, -(-len(questions) // REVIEW_PAGE_SIZE))
+    page = 0
+    if pages > 1:
+        page = st.segmented_control(
+            "Page", range(pages), default=0, key="review_page", label_visibility="collapsed",
+            format_func=lambda p: f"{p * REVIEW_PAGE_SIZE + 1}-{min((p + 1) * REVIEW_PAGE_SIZE, len(questions))}"
+        ) or 0
+    start = page * REVIEW_PAGE_SIZE
+    for i, q in enumerate(questions[start:start + REVIEW_PAGE_SIZE], start=start):
+        with st.container(border=True):
+            st.markdown(f"**Question {i+1}:**  \n" + _review_markdown(q, responses.get(q['id']), language))
+            st.info(f"**Explanation:**\n\n{q.get('explanation', 'No explanation available.')}")
+
 def show_history():
     st.header("History")
-    for sub in get_submissions(st.session_state.username):
+    include_archived = st.checkbox("Include archived exams", help="Exams older than the retention period are kept in the archive.")
+    for sub in get_submissions(st.session_state.username, include_archived=include_archived):
         with st.expander(f"{sub.get('subject')} - {sub.get('score')}/{sub.get('total_questions')}"):
             st.write(f"Date: {sub.get('submission_time')}")
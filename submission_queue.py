@@ -0,0 +1,155 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from bson import ObjectId, json_util
+from database import insert_submissions
+from question_model import to_plain
+
+logger = logging.getLogger(__name__)
+
+DRAIN_INTERVAL_SECONDS = 0.5
+DRAIN_BATCH_SIZE = 500
+# A claimed batch not acknowledged within this time (e.g. the drainer died) is handed out again
+CLAIM_SECONDS = 60
+MAX_BACKOFF_SECONDS = 60
+
+class SubmissionQueue:
+    """Durable local queue between the exam page and MongoDB.
+
+    Submitting an exam only appends a row to a SQLite file in WAL mode, which is fast and
+    survives a crash once enqueue returns. A background drainer writes queued submissions in
+    batches with insert_many and deletes them once stored; failures are retried with backoff.
+    Several replicas can share one file: batches are claimed with a short lease, and the
+    idempotency key (the document _id) makes a batch that is written twice harmless.
+    Connections are pooled, as in SQLiteSessionStore, so an enqueue costs only its insert.
+    """
+
+    def __init__(self, path, writer=insert_submissions, batch_size=DRAIN_BATCH_SIZE, interval=DRAIN_INTERVAL_SECONDS):
+        self.path = path
+        self.writer = writer
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread = None
+        self._idle = queue.SimpleQueue()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submission_queue (key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "enqueued_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_try_at REAL NOT NULL, "
+                "claimed_until REAL NOT NULL DEFAULT 0, last_error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS submission_queue_due ON submission_queue (next_try_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        # Acknowledged means on disk, not just in the OS cache
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="submission-drainer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, submission):
+        """Stores a finished exam durably and returns its idempotency key.
+
+        Enqueuing the same key again (a double click, a retried request) is a no-op.
+        """
+        submission = to_plain(submission)
+        submission.setdefault('_id', submission.get('attempt_id') or ObjectId())
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO submission_queue (key, payload, enqueued_at, next_try_at) VALUES (?, ?, ?, ?)",
+                (str(submission['_id']), json_util.dumps(submission), now, now)
+            )
+        return submission['_id']
+
+    def is_queued(self, key):
+        """True while the submission with this idempotency key has not been stored yet."""
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM submission_queue WHERE key = ?", (str(key),)).fetchone() is not None
+
+    def pending_count(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM submission_queue").fetchone()[0]
+
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT key, payload, attempts FROM submission_queue WHERE next_try_at <= ? AND claimed_until <= ? "
+            "ORDER BY enqueued_at LIMIT ?", (now, now, self.batch_size)
+        ).fetchall()
+        conn.executemany("UPDATE submission_queue SET claimed_until = ? WHERE key = ?", [(now + CLAIM_SECONDS, key) for key, _, _ in rows])
+        conn.execute("COMMIT")
+        return rows
+
+    def drain_once(self):
+        """Writes one batch of due submissions. Returns how many were stored."""
+        with self._connection() as conn:
+            rows = self._claim(conn)
+            if not rows: return 0
+            error = None
+            try:
+                retry = self.writer([json_util.loads(payload) for _, payload, _ in rows])
+                if retry is None:
+                    retry, error = range(len(rows)), "database unavailable"
+            except Exception as e:
+                retry, error = range(len(rows)), str(e)
+            retry = set(retry)
+            done = [(key,) for i, (key, _, _) in enumerate(rows) if i not in retry]
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM submission_queue WHERE key = ?", done)
+            conn.executemany(
+                "UPDATE submission_queue SET attempts = ?, next_try_at = ?, claimed_until = 0, last_error = ? WHERE key = ?",
+                [(attempts + 1, now + min(2 ** attempts, MAX_BACKOFF_SECONDS), error or "write error", key)
+                 for i, (key, _, attempts) in enumerate(rows) if i in retry]
+            )
+            conn.execute("COMMIT")
+            if retry:
+                logger.warning(f"Submission drain: {len(retry)} of {len(rows)} will be retried ({error or 'write error'})")
+            return len(done)
+
+    def _run(self):
+        while True:
+            try:
+                # Keep draining while full batches come back, then wait for the next interval
+                while self.drain_once() >= self.batch_size:
+                    pass
+            except sqlite3.Error as e:
+                logger.error(f"Submission drain failed: {e}", exc_info=True)
+            time.sleep(self.interval)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_submission_queue():
+    """Returns the process-wide queue (SUBMISSION_QUEUE_PATH), starting its drainer on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SubmissionQueue(os.getenv("SUBMISSION_QUEUE_PATH", "submission_queue.db"))
+            _queue.start()
+    return _queue
@@ -0,0 +1,44 @@
+import os
+import sys
+import uuid
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+from mongomock.collection import BulkOperationBuilder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Newer pymongo passes `sort` to bulk updates, which mongomock does not accept yet
+for _name in ("add_update", "add_replace"):
+    _original = getattr(BulkOperationBuilder, _name)
+    setattr(BulkOperationBuilder, _name, lambda self, *args, _original=_original, sort=None, **kwargs: _original(self, *args, **kwargs))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An empty mongomock database behind get_db()."""
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost")
+    monkeypatch.setattr(database, "_client", mongomock.MongoClient())
+    return database.get_db()
+
+
+@pytest.fixture
+def mongod_db(monkeypatch):
+    """A throwaway database on the real server at TEST_MONGO_URI behind get_db().
+
+    For aggregation pipelines mongomock cannot run ($setWindowFields, $merge, $lookup with a
+    sub-pipeline, $unionWith); skipped when TEST_MONGO_URI is not set.
+    """
+    uri = os.getenv("TEST_MONGO_URI")
+    if not uri:
+        pytest.skip("needs a real mongod: set TEST_MONGO_URI (mongomock lacks $setWindowFields and $merge)")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    name = f"exam_test_{uuid.uuid4().hex[:8]}"
+    monkeypatch.setenv("MONGO_URI", uri)
+    monkeypatch.setenv("DB_NAME", name)
+    monkeypatch.setattr(database, "_client", client)
+    yield client[name]
+    client.drop_database(name)
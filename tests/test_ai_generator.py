@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from ai_generator import _repair_json, _validate_questions
+
+
+def make_item(**fields):
+    return dict({"question_text": "Which bird is the national bird of India?", "option_a": "A bird", "option_b": "B 12",
+                 "option_c": "Peacock", "option_d": "Crow", "correct_option": "C", "explanation": "Because."}, **fields)
+
+
+@pytest.mark.parametrize("answer", ["c", "C)", "(C)", "C.", "Option C", "C) Peacock", "Peacock"])
+def test_correct_option_labels_map_to_their_letter(answer):
+    valid, rejected = _validate_questions([make_item(correct_option=answer)])
+
+    assert not rejected
+    assert valid[0]["correct_option"] == "C"
+
+
+@pytest.mark.parametrize("answer, letter", [("A bird", "A"), ("B 12", "B")])
+def test_option_text_starting_with_a_letter_is_not_a_label(answer, letter):
+    # Matched by its option text, not by its first character
+    valid, rejected = _validate_questions([make_item(option_c=answer, option_a="Sparrow", option_b="Owl", correct_option=answer)])
+
+    assert not rejected
+    assert valid[0]["correct_option"] == "C"
+
+
+def test_explanation_steps_given_as_a_list_are_joined():
+    valid, rejected = _validate_questions([make_item(explanation=["1. First step.", "2. Second step."])])
+
+    assert not rejected
+    assert valid[0]["explanation"] == "1. First step.\n2. Second step."
+
+
+def test_truncated_list_is_closed():
+    truncated = '[{"question_text": "Solve $\\sqrt{2}$", "option_a": "half'
+
+    assert json.loads(_repair_json(truncated)) == [{"question_text": "Solve $\\sqrt{2}$", "option_a": "half"}]
+
+
+def test_truncated_object_is_not_given_a_list_bracket():
+    assert json.loads(_repair_json('{"question_text": "Which river", "option_a": "Ganga')) == {
+        "question_text": "Which river", "option_a": "Ganga"}
@@ -0,0 +1,106 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import session_store
+import submission_queue
+from autosave import AttemptAutosaver
+from database import append_attempt_deltas, finalize_attempt, start_attempt, update_attempt, get_active_attempt
+from question_model import intern_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESUME_SCRIPT = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+from student import resume_attempt_view
+st.session_state.username = "alice"
+if "exam_config" not in st.session_state:
+    resume_attempt_view()
+"""
+
+
+def make_attempt(db, started=None):
+    questions = intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(3)
+    ])
+    config = {"subject": "Polity", "exam_name": "UPSC CSE", "difficulty": "Medium", "original_language": "English"}
+    return start_attempt({
+        "student_name": "alice", "config": config, "language": "English", "start_time": started or time.time(),
+        "original_questions": questions, "exam_questions": questions
+    }, db=db)
+
+
+def test_failed_flush_is_requeued_behind_newer_clicks(db):
+    attempt_id = make_attempt(db)
+    calls = []
+
+    def flaky(attempt_id, deltas):
+        calls.append(deltas)
+        if len(calls) == 1:
+            raise ConnectionError("network blip")
+        append_attempt_deltas(attempt_id, deltas)
+
+    saver = AttemptAutosaver(writer=flaky)
+    saver.record(attempt_id, "ai_q_0", "B")
+    saver.record(attempt_id, "ai_q_1", "C")
+    saver.flush()
+    # Changed while the write was failing: the newer choice wins
+    saver.record(attempt_id, "ai_q_1", "D")
+    saver.flush()
+
+    assert db.exam_attempts.find_one({"_id": attempt_id})["responses"] == {"ai_q_0": "B", "ai_q_1": "D"}
+    assert saver.drain(attempt_id) == []
+
+
+def test_finalize_writes_buffered_answers_and_closes_the_attempt(db):
+    attempt_id = make_attempt(db)
+    saver = AttemptAutosaver(writer=append_attempt_deltas, finalizer=finalize_attempt)
+    saver.record(attempt_id, "ai_q_0", "A")
+    saver.flush()
+    saver.record(attempt_id, "ai_q_2", "C")
+
+    assert saver.finalize(attempt_id, {"score": 1, "total_questions": 3})
+
+    attempt = db.exam_attempts.find_one({"_id": attempt_id})
+    assert attempt["status"] == "submitted"
+    assert attempt["responses"] == {"ai_q_0": "A", "ai_q_2": "C"}
+    assert attempt["score"] == 1
+    assert get_active_attempt("alice") is None
+
+
+def test_failed_finalize_leaves_the_attempt_to_the_queue(db):
+    attempt_id = make_attempt(db)
+
+    def down(*args):
+        raise ConnectionError("database unreachable")
+
+    saver = AttemptAutosaver(finalizer=down)
+    saver.record(attempt_id, "ai_q_0", "A")
+
+    assert not saver.finalize(attempt_id, {"score": 1})
+    assert db.exam_attempts.find_one({"_id": attempt_id})["status"] == "in_progress"
+
+
+def test_resume_rebuilds_answers_warnings_and_clock(db, tmp_path, monkeypatch):
+    monkeypatch.setenv("SUBMISSION_QUEUE_PATH", str(tmp_path / "queue.db"))
+    monkeypatch.setattr(submission_queue, "_queue", None)
+    monkeypatch.setattr(session_store, "_store", None)
+    started = time.time() - 600
+    attempt_id = make_attempt(db, started=started)
+    append_attempt_deltas(attempt_id, [{"question_id": "ai_q_1", "choice": "B", "at": None}])
+    update_attempt(attempt_id, {"copy_warnings": 2})
+
+    at = AppTest.from_string(RESUME_SCRIPT, default_timeout=30).run()
+    at.button[0].click().run()
+
+    assert not at.exception
+    assert at.session_state["attempt_id"] == attempt_id
+    assert at.session_state["student_responses"] == {"ai_q_1": "B"}
+    assert at.session_state["copy_warnings"] == 2
+    # The timer kept running while the student was away
+    assert at.session_state["start_time"] == started
+    assert [q["id"] for q in at.session_state["exam_questions"]] == ["ai_q_0", "ai_q_1", "ai_q_2"]
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import cohort
+from cohort import prepare_schedule, prepare_due_schedules, join_schedule, get_cohort_paper
+from database import get_active_attempt, insert_submissions, get_submissions
+from question_model import intern_questions
+from regrade import regrade_submissions
+
+
+class FakeGenerator:
+    def generate_questions(self, subject, exam_name, num_questions, difficulty=None):
+        return [
+            {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": f"a{i}", "option_b": f"b{i}",
+             "option_c": f"c{i}", "option_d": f"d{i}", "correct_option": "A", "explanation": "Because."}
+            for i in range(num_questions)
+        ]
+
+    def translate_questions(self, questions, language, allow_partial=True):
+        return [dict(q.to_dict(), question_text=f"[{language}] {q['question_text']}") for q in questions]
+
+
+def make_schedule(db, shuffle_options=True):
+    now = datetime.now()
+    schedule = {
+        "exam_name": "UPSC CSE", "subject": "Polity", "difficulty": "Medium", "num_questions": 5, "timer_minutes": 30,
+        "starts_at": now, "join_until": now + timedelta(minutes=15), "languages": ["Hindi"],
+        "shuffle_questions": True, "shuffle_options": shuffle_options, "status": "preparing"
+    }
+    schedule["_id"] = db.exam_schedules.insert_one(schedule).inserted_id
+    cohort._papers.clear()
+    assert prepare_schedule(schedule, generator=FakeGenerator(), db=db)
+    return db.exam_schedules.find_one({"_id": schedule["_id"]})
+
+
+def test_join_references_the_stored_paper(db):
+    schedule = make_schedule(db)
+    stored = db.questions.count_documents({})
+
+    states = [join_schedule(schedule, f"student_{n}", "Hindi", db=db) for n in range(20)]
+
+    # Shuffled options live in the refs, not in per-candidate copies of the questions
+    assert db.questions.count_documents({}) == stored
+    attempt = db.exam_attempts.find_one({"student_name": "student_0"})
+    assert all(len(ref["options"]) == 4 for ref in attempt["question_refs"])
+    assert len({tuple(q["correct_option"] for q in state["original_questions"]) for state in states}) > 1
+
+
+def test_resumed_attempt_shows_the_same_shuffled_paper(db):
+    schedule = make_schedule(db)
+    state = join_schedule(schedule, "alice", "Hindi", db=db)
+
+    attempt = get_active_attempt("alice")
+
+    for key in ("original_questions", "exam_questions"):
+        assert intern_questions(attempt[key]) == state[key]
+
+
+def test_correction_rescores_shuffled_submissions(db):
+    schedule = make_schedule(db)
+    state = join_schedule(schedule, "alice", "Hindi", db=db)
+    paper = get_cohort_paper(schedule["_id"], db=db)
+    original_refs, question_refs = paper.refs_for_candidate("alice", "Hindi")
+    shown = state["exam_questions"]
+    # Alice picks option "b" of every question, wherever it was shown
+    responses = {q["id"]: next(k for k in "ABCD" if q[f"option_{k.lower()}"].startswith("b")) for q in shown}
+    insert_submissions([{
+        "_id": state["attempt_id"], "attempt_id": state["attempt_id"], "student_name": "alice",
+        "exam_id": state["exam_config"]["exam_id"], "subject": "Polity", "difficulty": "Medium",
+        "score": 0, "total_questions": len(shown), "user_responses": responses, "violation": None,
+        "submission_time": datetime.now(), "question_refs": question_refs, "original_refs": original_refs,
+    }], db=db)
+
+    english = {ref["id"]: ref["hash"] for ref in schedule["paper"]["English"]}
+    report = regrade_submissions({english["ai_q_0"]: "B", english["ai_q_1"]: "B"})
+
+    assert report["score_changes"] == 2
+    assert db.student_submissions.find_one()["score"] == 2
+    # The history review shows the options in the order the candidate saw them, with the new key
+    review = get_submissions("alice", with_questions=True)[0]["questions_data"]
+    by_id = {q["id"]: q for q in review}
+    assert all(by_id[q]["correct_option"] == responses[q] for q in ("ai_q_0", "ai_q_1"))
+
+
+class EmptyGenerator(FakeGenerator):
+    def __init__(self):
+        self.calls = 0
+
+    def generate_questions(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls > 10:
+            raise RuntimeError("still regenerating")
+        return []
+
+
+def test_schedule_without_questions_is_left_for_the_next_run(db):
+    now = datetime.now()
+    for minutes in (5, 10):
+        db.exam_schedules.insert_one({
+            "exam_name": "UPSC CSE", "subject": "Polity", "difficulty": "Medium", "num_questions": 5, "timer_minutes": 30,
+            "starts_at": now + timedelta(minutes=minutes), "join_until": now + timedelta(minutes=minutes + 15),
+            "languages": [], "status": "scheduled"
+        })
+    generator = EmptyGenerator()
+
+    assert prepare_due_schedules(generator=generator) == 0
+
+    # One generation per schedule, then the run ends
+    assert generator.calls == 2
+    assert {s["status"] for s in db.exam_schedules.find()} == {"failed"}
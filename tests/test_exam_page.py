@@ -0,0 +1,73 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import session_store
+import student
+from question_model import intern_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAM_SCRIPT = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+from session_store import sync_exam_state, save_exam_state
+from student import exam_session_view
+sync_exam_state()
+if "exam_config" not in st.session_state:
+    save_exam_state(**st.session_state.exam)
+exam_session_view(st.session_state.exam_questions, st.session_state.exam_config)
+"""
+REVIEW_SCRIPT = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+from student import review_page
+review_page(st.session_state.exam_questions, {{"ai_q_0": "B"}})
+"""
+
+
+def make_questions(n):
+    return intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(n)
+    ])
+
+
+def test_palette_jumps_to_the_chosen_question(monkeypatch):
+    monkeypatch.setenv("MONGO_URI", "")
+    monkeypatch.setattr(session_store, "_store", None)
+    at = AppTest.from_string(EXAM_SCRIPT, default_timeout=30)
+    questions = make_questions(5)
+    at.session_state["username"] = "alice"
+    at.session_state["exam"] = {
+        "exam_questions": questions, "original_questions": questions, "current_language": "English", "current_q_index": 0,
+        "exam_config": {"subject": "Polity", "exam_name": "UPSC CSE", "difficulty": "Medium", "timer_minutes": 30},
+        "student_responses": {}, "start_time": time.time()
+    }
+    at.run()
+
+    at.button_group(key="palette").set_value(3).run()
+
+    assert not at.exception
+    assert at.session_state["current_q_index"] == 3
+    assert any("Question 4 of 5" in m.value for m in at.markdown)
+
+
+def test_review_pages_and_reuses_rendered_questions(monkeypatch):
+    monkeypatch.setattr(student, "_review_cache", type(student._review_cache)())
+    at = AppTest.from_string(REVIEW_SCRIPT, default_timeout=30)
+    at.session_state["exam_questions"] = make_questions(student.REVIEW_PAGE_SIZE + 3)
+    at.run()
+    assert [m.value for m in at.markdown if m.value.startswith("**Question")][-1].startswith(f"**Question {student.REVIEW_PAGE_SIZE}:**")
+
+    at.button_group(key="review_page").set_value(1).run()
+
+    shown = [m.value for m in at.markdown if m.value.startswith("**Question")]
+    assert len(shown) == 3
+    assert shown[0].startswith(f"**Question {student.REVIEW_PAGE_SIZE + 1}:**")
+    # Cached by content, language and choice: no Question objects are held
+    assert len(student._review_cache) == student.REVIEW_PAGE_SIZE + 3
+    assert all(isinstance(key[0], str) for key in student._review_cache)
@@ -0,0 +1,67 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import export
+from database import insert_submissions, store_questions
+from question_model import intern_questions
+
+
+def make_questions():
+    return intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": f"a{i}", "option_b": f"b{i}",
+         "option_c": f"c{i}", "option_d": f"d{i}", "correct_option": "A", "explanation": "Because."}
+        for i in range(3)
+    ])
+
+
+def submission(name, responses, **fields):
+    return dict({
+        "student_name": name, "exam_id": "ai_generated_UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "score": 0, "total_questions": 3, "user_responses": responses, "violation": None, "submission_time": datetime.now(),
+    }, **fields)
+
+
+def read_rows(report):
+    return pd.concat(pd.read_parquet(f) if f.endswith(".parquet") else pd.read_csv(f) for f in report["files"])
+
+
+def test_one_row_per_answer_with_the_key_the_candidate_saw(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "SETTLE_SECONDS", 0)
+    questions = make_questions()
+    refs = store_questions(questions, db=db)
+    # Options of the second question shown as C, A, D, B: the original key A is shown as B
+    shuffled = [dict(ref, options="CADB") if i == 1 else ref for i, ref in enumerate(refs)]
+    insert_submissions([submission("shuffled", {"ai_q_0": "A", "ai_q_1": "B"}, question_refs=shuffled)], db=db)
+    # Stored before the question store existed
+    db.student_submissions.insert_one(submission("legacy", {"ai_q_2": "A"}, questions_data=[q.to_dict() for q in questions]))
+
+    report = export.export_submissions(str(tmp_path), fmt="parquet")
+
+    assert (report["documents"], report["rows"]) == (2, 6)
+    assert report["files"][0].endswith(".parquet")
+    rows = read_rows(report).set_index(["student_name", "question_id"])
+    assert rows.loc[("shuffled", "ai_q_1"), "correct_option"] == "B"
+    assert list(rows.loc["shuffled", "is_correct"]) == [True, True, False]
+    assert list(rows.loc["legacy", "is_correct"]) == [False, False, True]
+    assert rows.loc[("shuffled", "ai_q_0"), "question_hash"] == questions[0].content_hash
+
+
+def test_incremental_export_resumes_from_the_watermark(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "SETTLE_SECONDS", 0)
+    questions = make_questions()
+    insert_submissions([submission(f"first_{n}", {}, questions_data=questions) for n in range(3)], db=db)
+
+    first = export.export_submissions(str(tmp_path), fmt="csv", incremental=True)
+    with open(os.path.join(tmp_path, export.WATERMARK_FILE), encoding="utf-8") as f:
+        mark = json.load(f)["submissions"]
+    insert_submissions([submission("second_0", {}, questions_data=questions)], db=db)
+    second = export.export_submissions(str(tmp_path), fmt="csv", incremental=True)
+    nothing_new = export.export_submissions(str(tmp_path), fmt="csv", incremental=True)
+
+    assert (first["documents"], second["documents"], nothing_new["documents"]) == (3, 1, 0)
+    assert set(read_rows(second)["student_name"]) == {"second_0"}
+    with open(os.path.join(tmp_path, export.WATERMARK_FILE), encoding="utf-8") as f:
+        assert json.load(f)["submissions"] > mark
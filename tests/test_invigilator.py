@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from invigilator import EventTailer
+
+
+def make_submission(n, **fields):
+    return dict({
+        "student_name": f"student_{n}", "exam_id": "ai_generated_UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "score": n % 5, "total_questions": 5, "user_responses": {}, "violation": None, "submission_time": datetime.now(),
+        "question_refs": [],
+    }, **fields)
+
+
+def test_tailer_pages_through_a_batch_sharing_one_stamp(db):
+    stamp = datetime.now() - timedelta(minutes=1)
+    db.student_submissions.insert_many([make_submission(n, ingested_at=stamp) for n in range(500)])
+    tailer = EventTailer(db=db, batch_size=500, use_change_streams=False)
+    assert tailer.poll_once() == 500
+
+    db.student_submissions.insert_many([make_submission(n, ingested_at=stamp + timedelta(seconds=1)) for n in range(500, 510)])
+    seen = sum(tailer.poll_once() for _ in range(3))
+
+    assert seen == 10
+    assert len(tailer.snapshot()[0]) == 510
+
+
+def test_tailer_waits_for_a_batch_to_settle(db):
+    tailer = EventTailer(db=db, use_change_streams=False)
+    db.student_submissions.insert_one(make_submission(0, ingested_at=datetime.now()))
+
+    assert tailer.poll_once() == 0
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from proctoring_risk import refresh_risk_summaries, get_risk_report, JOB_ID, RISK_WEIGHTS, SETTLE_SECONDS
+
+
+def test_watermark_stays_behind_unsettled_events(db):
+    now = datetime.now(timezone.utc)
+    settled = ObjectId.from_datetime(now - timedelta(seconds=SETTLE_SECONDS * 2))
+    # Generated just now but possibly not committed everywhere yet; it must stay above the watermark
+    recent = ObjectId.from_datetime(now)
+    db.proctoring_logs.insert_many([
+        {"_id": settled, "attempt_id": None, "event_type": "tab_switch"},
+        {"_id": recent, "attempt_id": None, "event_type": "tab_switch"},
+    ])
+
+    refresh_risk_summaries()
+
+    assert db.job_state.find_one({"_id": JOB_ID})["last_event_id"] == settled
+
+
+def log_events(db, attempt_id, started_at, events):
+    # Settled long ago, so ObjectIds carry the event time
+    db.proctoring_logs.insert_many([
+        {"_id": ObjectId.from_datetime(started_at + timedelta(seconds=offset)), "attempt_id": attempt_id, "student_name": "alice",
+         "event_type": event_type, "timestamp": started_at + timedelta(seconds=offset)}
+        for offset, event_type in events
+    ])
+
+
+def test_features_of_attempt_linked_events(mongod_db):
+    db = mongod_db
+    earlier_start = datetime(2026, 1, 5, 10, 0)
+    started_at = datetime(2026, 1, 12, 10, 0)
+    earlier, attempt = "attempt_earlier", "attempt_latest"
+    db.exam_attempts.insert_many([
+        {"_id": earlier, "student_name": "alice", "exam_id": "ai_generated_UPSC CSE", "subject": "Polity",
+         "started_at": earlier_start, "config": {"timer_minutes": 30}},
+        {"_id": attempt, "student_name": "alice", "exam_id": "ai_generated_UPSC CSE", "subject": "Polity",
+         "started_at": started_at, "config": {"timer_minutes": 30}},
+    ])
+    log_events(db, earlier, earlier_start, [(60, "tab_switch")])
+    # Two tab switches 30 s apart in the first window, a copy later, one tab switch in the last 5 minutes
+    log_events(db, attempt, started_at, [(60, "tab_switch"), (90, "tab_switch"), (600, "copy_attempt"), (1700, "tab_switch")])
+
+    assert refresh_risk_summaries() == 2
+
+    risk = db.proctoring_risk.find_one({"_id": attempt})
+    assert (risk["total_events"], risk["tab_switches"], risk["copy_attempts"]) == (4, 3, 1)
+    assert sorted((w["window"], w["events"]) for w in risk["events_per_window"]) == [(0, 2), (2, 1), (5, 1)]
+    assert risk["max_events_per_window"] == 2
+    assert risk["min_gap_ms"] == 30_000
+    assert risk["near_end_events"] == 1
+    assert risk["prior_flagged_attempts"] == 1
+    base = 3 * RISK_WEIGHTS["tab_switch"] + RISK_WEIGHTS["copy_attempt"] + RISK_WEIGHTS["near_end"] + RISK_WEIGHTS["burst"]
+    assert risk["risk_score"] == base + RISK_WEIGHTS["prior_attempt"]
+    assert [r["_id"] for r in get_risk_report()] == [attempt, earlier]
+    assert db.proctoring_logs.count_documents({"rolled_up_at": {"$exists": True}}) == 5
@@ -0,0 +1,72 @@
+import copy
+import gc
+import threading
+
+from question_model import intern_question, intern_questions, localize_questions, permute_options, remap_option, to_plain, _interned
+
+
+def make_data(i, text="Question"):
+    return {"id": f"ai_q_{i}", "question_text": f"{text} {i}?", "option_a": "a", "option_b": "b",
+            "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+
+
+def test_sessions_share_one_object_per_question():
+    # Every session loading the same paper gets the same objects, copies included
+    sessions = [intern_questions([make_data(i) for i in range(20)]) for _ in range(100)]
+
+    assert all(a is b for paper in sessions for a, b in zip(paper, sessions[0]))
+    assert copy.deepcopy(sessions[0])[0] is sessions[0][0]
+    assert intern_question(dict(make_data(0), id="other_id")) is not sessions[0][0]
+    assert to_plain(sessions[0][0]) == make_data(0)
+
+
+def test_unused_questions_leave_the_intern_table():
+    question = intern_question(make_data(0, text="Short-lived"))
+    key = (question.content_hash, question.id)
+    assert key in _interned
+
+    del question
+    gc.collect()
+
+    assert key not in _interned
+
+
+def test_first_translation_stays_attached():
+    originals = intern_questions([make_data(i, text="Overlay") for i in range(3)])
+    first = localize_questions(originals, [make_data(i, text="पहला") for i in range(3)], "Hindi")
+    second = localize_questions(originals, [make_data(i, text="दूसरा") for i in range(3)], "Hindi")
+
+    # Each session keeps what it translated; other sessions reuse the first translation only
+    assert second[0]["question_text"] == "दूसरा 0?"
+    assert [q.localized("Hindi") for q in originals] == first
+    assert originals[0].localized("Tamil") is originals[0]
+
+
+def test_concurrent_translations_agree_on_one_overlay():
+    original = intern_question(make_data(0, text="Racing"))
+    barrier = threading.Barrier(8)
+
+    def translate(n):
+        barrier.wait()
+        localize_questions([original], [make_data(0, text=f"Translation {n}")], "Hindi")
+
+    threads = [threading.Thread(target=translate, args=(n,)) for n in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    overlay = original.localized("Hindi")
+    assert overlay is not original
+    assert all(original.localized("Hindi") is overlay for _ in range(3))
+
+
+def test_permuted_options_keep_the_answer():
+    data = dict(make_data(0), option_a="Delhi", option_b="Mumbai", option_c="Chennai", option_d="Kolkata", correct_option="B")
+
+    shown = permute_options(data, "CADB")
+
+    assert [shown[f"option_{k}"] for k in "abcd"] == ["Chennai", "Delhi", "Kolkata", "Mumbai"]
+    assert shown["correct_option"] == "D"
+    assert shown[f"option_{shown['correct_option'].lower()}"] == "Mumbai"
+    assert [remap_option(k, "CADB") for k in "ABCD"] == ["B", "D", "A", "C"]
+    assert remap_option("", "CADB") == ""
+    assert data["correct_option"] == "B"
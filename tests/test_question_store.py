@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import database
+from database import migrate_submission_questions, get_submissions, hydrate_submissions, question_from_ref
+from question_model import question_hash
+
+
+def make_question(i):
+    return {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+            "option_c": "c", "option_d": "d", "correct_option": "ABCD"[i % 4], "explanation": "Because."}
+
+
+def legacy_submission(n, questions):
+    return {"student_name": "alice", "score": 1, "total_questions": len(questions), "user_responses": {},
+            "submission_time": datetime.now() - timedelta(minutes=n), "questions_data": questions}
+
+
+def test_migrated_submissions_hydrate_back(db, monkeypatch):
+    # Seven exams drawn from a bank of five questions, so most questions repeat
+    papers = [[make_question((n + i) % 5) for i in range(3)] for n in range(7)]
+    db.student_submissions.insert_many([legacy_submission(n, paper) for n, paper in enumerate(papers)])
+
+    assert migrate_submission_questions(batch_size=3) == 7
+
+    assert db.questions.count_documents({}) == 5
+    assert db.student_submissions.count_documents({"questions_data": {"$exists": True}}) == 0
+    lookups = []
+    get_questions_by_hash = database.get_questions_by_hash
+    monkeypatch.setattr(database, "get_questions_by_hash", lambda *args, **kwargs: lookups.append(1) or get_questions_by_hash(*args, **kwargs))
+
+    history = get_submissions("alice", with_questions=True)
+
+    # One $in lookup for the whole history, newest first, with the questions as they were embedded
+    assert len(lookups) == 1
+    assert [[{key: q[key] for key in make_question(0)} for q in s["questions_data"]] for s in history] == papers
+    assert migrate_submission_questions() == 0
+
+
+def test_submissions_still_embedding_questions_are_left_alone(db):
+    paper = [make_question(0)]
+    submissions = [legacy_submission(0, paper)]
+
+    hydrate_submissions(submissions, db=db)
+
+    assert submissions[0]["questions_data"] is paper
+
+
+def test_reference_to_a_missing_question_keeps_its_id():
+    ref = {"id": "ai_q_9", "hash": question_hash(make_question(9))}
+
+    assert question_from_ref({}, ref) == {"id": "ai_q_9"}
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from database import insert_submissions, store_questions, get_questions_by_hash
+from question_model import intern_questions, localize_questions
+from regrade import regrade_submissions
+
+
+def make_paper():
+    originals = intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(3)
+    ])
+    translated = localize_questions(originals, [dict(q.to_dict(), question_text=f"प्रश्न {i}?") for i, q in enumerate(originals)], "Hindi")
+    return originals, translated
+
+
+def submission(name, shown, originals, responses):
+    return {
+        "student_name": name, "exam_id": "ai_generated_UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "score": sum(1 for q in shown if responses.get(q['id']) == q['correct_option']), "total_questions": len(shown),
+        "user_responses": responses, "violation": None, "submission_time": datetime.now(),
+        "questions_data": shown, "original_questions_data": originals,
+    }
+
+
+def test_correction_reaches_translated_papers(db):
+    originals, translated = make_paper()
+    responses = {"ai_q_0": "B", "ai_q_1": "A", "ai_q_2": "A"}
+    insert_submissions([
+        submission("english", originals, originals, dict(responses)),
+        submission("hindi", translated, originals, dict(responses)),
+    ], db=db)
+
+    report = regrade_submissions({originals[0].content_hash: "B"})
+
+    assert report["matched"] == 2
+    assert report["updated"] == 2
+    scores = {s["student_name"]: s["score"] for s in db.student_submissions.find()}
+    assert scores == {"english": 3, "hindi": 3}
+    keys = get_questions_by_hash([originals[0].content_hash, translated[0].content_hash], fields=["correct_option"], db=db)
+    assert {h: q["correct_option"] for h, q in keys.items()} == {originals[0].content_hash: "B", translated[0].content_hash: "B"}
+
+
+def test_correction_of_the_shown_question_still_applies(db):
+    # Older submissions only reference the paper they were shown
+    originals, translated = make_paper()
+    db.student_submissions.insert_one({
+        "student_name": "legacy", "score": 2, "total_questions": 3, "percentage": 67,
+        "user_responses": {"ai_q_0": "B", "ai_q_1": "A", "ai_q_2": "A"},
+        "question_refs": store_questions(translated, db=db),
+    })
+
+    regrade_submissions({translated[0].content_hash: "B"})
+
+    assert db.student_submissions.find_one({"student_name": "legacy"})["score"] == 3
+
+
+def test_rerun_does_not_count_twice(db):
+    originals, translated = make_paper()
+    insert_submissions([submission("hindi", translated, originals, {"ai_q_0": "B"})], db=db)
+    store_questions(originals, db=db)
+
+    regrade_submissions({originals[0].content_hash: "B"})
+    regrade_submissions({originals[0].content_hash: "B"})
+
+    assert db.student_submissions.find_one()["score"] == 1
@@ -0,0 +1,41 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import student
+from question_model import intern_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_SCRIPT = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+from student import results_view
+results_view(st.session_state.exam_questions)
+"""
+
+
+def test_leaderboard_is_not_queried_on_every_rerun(monkeypatch):
+    monkeypatch.setenv("MONGO_URI", "")
+    calls = []
+    monkeypatch.setattr(student, "get_leaderboard", lambda *cohort: calls.append(cohort) or [])
+    student._leaderboard.clear()
+    questions = intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(3)
+    ])
+    at = AppTest.from_string(RESULTS_SCRIPT, default_timeout=30)
+    at.session_state["username"] = "alice"
+    at.session_state["exam_questions"] = questions
+    at.session_state["student_responses"] = {"ai_q_0": "A"}
+    at.session_state["exam_config"] = {"subject": "Polity", "exam_name": "UPSC CSE", "difficulty": "Medium"}
+    at.session_state["last_score"] = 1
+    at.session_state["start_time"] = time.time()
+
+    for _ in range(5):
+        at.run()
+
+    assert not at.exception
+    assert calls == [("ai_generated_UPSC CSE", "Polity", "Medium")]
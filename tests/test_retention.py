@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import export
+from database import insert_submissions, score_stats_key, ARCHIVE_COLLECTION
+from leaderboard import get_leaderboard
+from question_model import intern_questions
+from regrade import regrade_submissions
+from retention import archive_submissions
+
+
+def make_questions():
+    return intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(2)
+    ])
+
+
+def submission(name, questions, responses, days_ago):
+    return {
+        "student_name": name, "exam_id": "ai_generated_UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "score": sum(1 for q in questions if responses.get(q['id']) == q['correct_option']), "total_questions": len(questions),
+        "user_responses": responses, "violation": None, "submission_time": datetime.now() - timedelta(days=days_ago),
+        "questions_data": questions,
+    }
+
+
+def seed(db):
+    questions = make_questions()
+    insert_submissions([
+        submission("veteran", questions, {"ai_q_0": "B", "ai_q_1": "A"}, days_ago=365),
+        submission("recent", questions, {"ai_q_0": "A", "ai_q_1": "B"}, days_ago=1),
+    ], db=db)
+    assert archive_submissions()["archived"] == 1
+    return questions
+
+
+def test_regrade_reaches_archived_submissions(db):
+    questions = seed(db)
+
+    report = regrade_submissions({questions[0].content_hash: "B"})
+
+    assert report["matched"] == 2
+    assert db[ARCHIVE_COLLECTION].find_one({"student_name": "veteran"})["score"] == 2
+    buckets = db.score_stats.find_one({"_id": score_stats_key("ai_generated_UPSC CSE", "Polity", "Medium")})["buckets"]
+    assert {b: n for b, n in buckets.items() if n} == {"0": 1, "100": 1}
+
+
+def test_leaderboard_ranks_archived_submissions(db):
+    questions = seed(db)
+    regrade_submissions({questions[0].content_hash: "B"})
+
+    board = get_leaderboard("ai_generated_UPSC CSE", "Polity", "Medium")
+
+    assert [s["student_name"] for s in board] == ["veteran", "recent"]
+
+
+def test_export_includes_archive_only_when_asked(db, tmp_path, monkeypatch):
+    seed(db)
+    monkeypatch.setattr(export, "SETTLE_SECONDS", 0)
+
+    hot = export.export_submissions(str(tmp_path / "hot"), fmt="csv")
+    everything = export.export_submissions(str(tmp_path / "all"), fmt="csv", include_archived=True)
+
+    assert (hot["documents"], everything["documents"]) == (1, 2)
+    rows = pd.concat(pd.read_csv(f) for f in everything["files"])
+    assert list(rows.drop_duplicates("student_name")["student_name"]) == ["veteran", "recent"]
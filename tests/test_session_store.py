@@ -0,0 +1,168 @@
+"""Replica failover for the shared exam session store.
+
+A replica is killed mid-exam (its process state is simply dropped) and another one,
+sharing only the store, carries the same exam on. Runs offline: SQLite in a temp
+directory and mongomock for the Mongo backend.
+"""
+import os
+import threading
+
+import mongomock
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import session_store
+from session_store import SQLiteSessionStore, MongoSessionStore, SessionConflict, SESSION_PARAM
+
+EXAM_SCRIPT = f"""
+import sys
+sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})
+import streamlit as st
+from session_store import sync_exam_state, save_exam_state, update_exam_state
+
+st.session_state.username = "alice"
+sync_exam_state()
+if "exam_config" not in st.session_state:
+    if st.button("Start", key="start"):
+        save_exam_state(exam_config={{"subject": "Polity"}}, student_responses={{}}, current_q_index=0)
+        st.rerun()
+else:
+    for qid in ("q1", "q2", "q3"):
+        if st.button(qid, key=qid):
+            update_exam_state(lambda state, qid=qid: {{"student_responses": {{**(state.get("student_responses") or {{}}), qid: "B"}}}})
+    if st.button("Next", key="next"):
+        save_exam_state(current_q_index=st.session_state.current_q_index + 1)
+    st.write(f"answered={{sorted(st.session_state.student_responses)}} index={{st.session_state.current_q_index}}")
+"""
+
+
+def sqlite_pair(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    return SQLiteSessionStore(path), SQLiteSessionStore(path)
+
+
+def mongo_pair(tmp_path):
+    db = mongomock.MongoClient().exam_system
+    return MongoSessionStore(db), MongoSessionStore(db)
+
+
+@pytest.fixture(params=[sqlite_pair, mongo_pair], ids=["sqlite", "mongo"])
+def replicas(request, tmp_path):
+    return request.param(tmp_path)
+
+
+def answer(qid):
+    return lambda state: {"student_responses": {**(state.get("student_responses") or {}), qid: "A"}}
+
+
+def test_exam_continues_on_another_replica(replicas):
+    first, second = replicas
+    first.update("alice", lambda state: {"exam_config": {"subject": "Polity"}, "student_responses": {}, "current_q_index": 0})
+    first.update("alice", answer("q1"))
+    del first  # the replica dies mid-exam
+
+    state, version = second.load("alice")
+    assert state["student_responses"] == {"q1": "A"}
+    assert version == 2
+    state, version = second.update("alice", answer("q2"))
+    assert state["student_responses"] == {"q1": "A", "q2": "A"}
+    assert version == 3
+    assert second.version("alice") == 3
+
+
+def test_stale_write_is_rejected_and_retried(replicas):
+    first, second = replicas
+    first.update("alice", lambda state: {"student_responses": {}})
+    _, version = first.load("alice")
+    second.update("alice", answer("q1"))
+
+    # The first replica's version is stale now, so a blind write must not land...
+    assert first.apply("alice", {"student_responses": {"q2": "A"}}, version) is None
+    # ...while update() re-reads and keeps both answers
+    state, _ = first.update("alice", answer("q2"))
+    assert state["student_responses"] == {"q1": "A", "q2": "A"}
+
+
+def test_concurrent_replicas_lose_no_updates(tmp_path):
+    stores = sqlite_pair(tmp_path)
+    per_thread = 25
+
+    def bump(store):
+        for _ in range(per_thread):
+            store.update("alice", lambda state: {"copy_warnings": (state.get("copy_warnings") or 0) + 1}, retries=200)
+
+    threads = [threading.Thread(target=bump, args=(stores[i % 2],)) for i in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    state, version = stores[0].load("alice")
+    assert state["copy_warnings"] == 4 * per_thread
+    assert version == 4 * per_thread
+
+
+def test_update_gives_up_after_retries(tmp_path):
+    store, rival = sqlite_pair(tmp_path)
+
+    def always_loses(state):
+        rival.update("alice", lambda s: {"current_q_index": (s.get("current_q_index") or 0) + 1})
+        return {"current_q_index": 0}
+
+    with pytest.raises(SessionConflict):
+        store.update("alice", always_loses, retries=3)
+
+
+def test_app_resumes_on_second_replica(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_SQLITE_PATH", str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(session_store, "_store", None)
+
+    first = AppTest.from_string(EXAM_SCRIPT, default_timeout=30).run()
+    first.button(key="start").click().run()
+    first.button(key="q1").click().run()
+    first.button(key="next").click().run()
+    assert "answered=['q1'] index=1" in first.markdown[-1].value
+
+    # Kill the first replica: its process and its store object are gone, only the file and the tab's URL remain
+    tab = first.query_params[SESSION_PARAM]
+    del first
+    monkeypatch.setattr(session_store, "_store", None)
+    second = AppTest.from_string(EXAM_SCRIPT, default_timeout=30)
+    second.query_params[SESSION_PARAM] = tab
+    second.run()
+    assert not second.exception
+    assert "answered=['q1'] index=1" in second.markdown[-1].value
+    second.button(key="q2").click().run()
+    assert "answered=['q1', 'q2'] index=1" in second.markdown[-1].value
+
+
+def test_each_tab_has_its_own_exam(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_SQLITE_PATH", str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(session_store, "_store", None)
+
+    first = AppTest.from_string(EXAM_SCRIPT, default_timeout=30).run()
+    first.button(key="start").click().run()
+    first.button(key="q1").click().run()
+    other_tab = AppTest.from_string(EXAM_SCRIPT, default_timeout=30).run()
+
+    assert other_tab.query_params[SESSION_PARAM] != first.query_params[SESSION_PARAM]
+    assert other_tab.button(key="start")
+    first.run()
+    assert "answered=['q1'] index=0" in first.markdown[-1].value
+
+
+def test_unchanged_state_is_not_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_SQLITE_PATH", str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(session_store, "_store", None)
+    loads = []
+    load = SQLiteSessionStore.load
+    monkeypatch.setattr(SQLiteSessionStore, "load", lambda self, key: loads.append(key) or load(self, key))
+
+    at = AppTest.from_string(EXAM_SCRIPT, default_timeout=30).run()
+    at.button(key="start").click().run()
+    before = len(loads)
+    for _ in range(5):
+        at.run()
+
+    assert len(loads) == before
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import database
+from database import insert_submissions, get_active_attempt
+from submission_queue import SubmissionQueue
+
+
+def make_submission(n, **fields):
+    return dict({
+        "student_name": f"student_{n}", "exam_id": "ai_generated_UPSC CSE", "subject": "Polity", "difficulty": "Medium",
+        "score": n % 5, "total_questions": 5, "user_responses": {}, "violation": None, "submission_time": datetime.now(),
+        "question_refs": [],
+    }, **fields)
+
+
+def test_interrupted_histogram_update_is_finished_on_retry(db, monkeypatch):
+    batch = [make_submission(n, _id=ObjectId()) for n in range(3)]
+    record_scores = database.record_scores
+
+    def fails_once(db, submissions):
+        monkeypatch.setattr(database, "record_scores", record_scores)
+        raise ConnectionError("network blip")
+
+    monkeypatch.setattr(database, "record_scores", fails_once)
+    with pytest.raises(ConnectionError):
+        insert_submissions([dict(s) for s in batch], db=db)
+    assert db.student_submissions.count_documents({}) == 3
+
+    # The queue retries the whole batch: all duplicates now, but not yet counted
+    assert insert_submissions([dict(s) for s in batch], db=db) == []
+    assert insert_submissions([dict(s) for s in batch], db=db) == []
+
+    assert db.score_stats.find_one()["count"] == 3
+
+
+def test_queued_submission_hides_its_attempt_from_resume(db, tmp_path):
+    older = db.exam_attempts.insert_one({"student_name": "alice", "status": "in_progress", "started_at": datetime.now() - timedelta(hours=1),
+                                         "original_refs": [], "question_refs": []}).inserted_id
+    latest = db.exam_attempts.insert_one({"student_name": "alice", "status": "in_progress", "started_at": datetime.now(),
+                                          "original_refs": [], "question_refs": []}).inserted_id
+    queue = SubmissionQueue(str(tmp_path / "queue.db"), writer=lambda subs: insert_submissions(subs, db=db))
+    queue.enqueue(make_submission(0, student_name="alice", _id=latest, attempt_id=latest))
+
+    # Submitted but not drained yet: only the older, genuinely unfinished attempt is offered
+    assert get_active_attempt("alice", exclude=queue.is_queued)["_id"] == older
+
+    queue.drain_once()
+    assert not queue.is_queued(latest)
+    assert db.exam_attempts.find_one({"_id": latest})["status"] == "submitted"
+    assert get_active_attempt("alice", exclude=queue.is_queued)["_id"] == older
+
+
+def test_overlapping_drainers_count_each_submission_once(db, monkeypatch):
+    batch = [make_submission(n, _id=ObjectId()) for n in range(50)]
+    insert_submissions([dict(s) for s in batch[:10]], db=db)
+    record_scores = database.record_scores
+
+    def second_drainer_runs_meanwhile(db, submissions):
+        # Another replica picks up the same batch while this one is still counting it
+        monkeypatch.setattr(database, "record_scores", record_scores)
+        insert_submissions([dict(s) for s in batch], db=db)
+        record_scores(db, submissions)
+
+    monkeypatch.setattr(database, "record_scores", second_drainer_runs_meanwhile)
+    insert_submissions([dict(s) for s in batch], db=db)
+
+    assert db.score_stats.find_one()["count"] == 50
+    assert db.student_submissions.count_documents({"counted": True}) == 50
+
+
+def test_queue_reuses_its_connections(tmp_path, monkeypatch):
+    connects = []
+    connect = SubmissionQueue._connect
+    monkeypatch.setattr(SubmissionQueue, "_connect", lambda self: connects.append(1) or connect(self))
+    queue = SubmissionQueue(str(tmp_path / "queue.db"), writer=lambda subs: [])
+
+    for n in range(20):
+        queue.enqueue(make_submission(n))
+        queue.is_queued(n)
+    queue.drain_once()
+
+    assert len(connects) == 1
+    assert queue.pending_count() == 0
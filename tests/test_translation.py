@@ -0,0 +1,69 @@
+import json
+import re
+from datetime import datetime, timedelta
+
+from langchain_core.runnables import RunnableLambda
+
+import ai_generator
+from ai_generator import QuestionGenerator
+from cohort import prepare_schedule
+from question_model import intern_questions
+
+
+def make_questions(n):
+    return intern_questions([
+        {"id": f"ai_q_{i}", "question_text": f"Question {i} about the constitution?", "option_a": "a", "option_b": "b",
+         "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "Because."}
+        for i in range(n)
+    ])
+
+
+def fake_llm(failing_ids=()):
+    """Translates by tagging texts; chunks containing any of `failing_ids` come back unusable."""
+    def respond(prompt):
+        text = prompt.to_string()
+        chunk = json.loads(text[text.index("Questions to translate:") + len("Questions to translate:"):text.index("Return ONLY")])
+        if any(q["id"] in failing_ids for q in chunk):
+            return "I cannot translate this."
+        language = re.search(r"into (\w+)\.", text).group(1)
+        return json.dumps([dict(q, question_text=f"[{language}] {q['question_text']}") for q in chunk], ensure_ascii=False)
+    return RunnableLambda(respond)
+
+
+def make_generator(failing_ids=()):
+    generator = QuestionGenerator.__new__(QuestionGenerator)
+    generator.llm = fake_llm(failing_ids)
+    generator.stats = {}
+    return generator
+
+
+def test_empty_paper_translates_to_empty():
+    assert make_generator().translate_questions([], "Hindi") == []
+
+
+def test_failed_chunk_stays_english_unless_partial_results_are_refused(monkeypatch):
+    monkeypatch.setattr(ai_generator, "TRANSLATION_CHUNK_TOKENS", 60)
+    questions = make_questions(6)
+    generator = make_generator(failing_ids={"ai_q_5"})
+
+    partial = generator.translate_questions(questions, "Hindi")
+    assert partial[0]["question_text"].startswith("[Hindi]")
+    assert partial[5]["question_text"] == questions[5]["question_text"]
+
+    assert generator.translate_questions(questions, "Hindi", allow_partial=False) is questions
+
+
+def test_cohort_paper_leaves_out_incomplete_translations(db, monkeypatch):
+    monkeypatch.setattr(ai_generator, "TRANSLATION_CHUNK_TOKENS", 60)
+    generator = make_generator(failing_ids={"ai_q_3"})
+    generator.generate_questions = lambda *args, **kwargs: [q.to_dict() for q in make_questions(4)]
+    now = datetime.now()
+    schedule = {"_id": "mock", "exam_name": "UPSC CSE", "subject": "Polity", "difficulty": "Medium", "num_questions": 4,
+                "timer_minutes": 30, "starts_at": now, "join_until": now + timedelta(minutes=15), "languages": ["Hindi"]}
+    db.exam_schedules.insert_one(schedule)
+
+    assert prepare_schedule(schedule, generator=generator, db=db)
+
+    stored = db.exam_schedules.find_one({"_id": "mock"})
+    assert list(stored["paper"]) == ["English"]
+    assert stored["missing_languages"] == ["Hindi"]